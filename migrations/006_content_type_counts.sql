@@ -0,0 +1,26 @@
+-- Migration: Grouped content_type counts for distribution reports
+-- Run this in Supabase SQL Editor
+-- Used by run_migration.py, analyze_articles.py and sync_content_types_from_wp.py
+-- so reports no longer download every row just to count it.
+
+-- 1. Create the aggregation function (callable as RPC)
+CREATE OR REPLACE FUNCTION lab_article_content_type_counts()
+RETURNS TABLE (content_type TEXT, article_count BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT lab_articles.content_type, COUNT(*) AS article_count
+  FROM lab_articles
+  GROUP BY lab_articles.content_type
+  ORDER BY lab_articles.content_type;
+$$;
+
+-- 2. Only the service role needs it
+REVOKE EXECUTE ON FUNCTION lab_article_content_type_counts() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION lab_article_content_type_counts() TO service_role;
+
+-- 3. Make PostgREST pick up the new function
+NOTIFY pgrst, 'reload schema';
+
+-- Verify
+SELECT * FROM lab_article_content_type_counts();
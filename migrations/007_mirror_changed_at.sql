@@ -0,0 +1,52 @@
+-- Migration: Change tracking column for the local mirror of lab_articles and posts
+-- Run this in Supabase SQL Editor
+-- Required by the local mirror (mirror.py, --mirror): it refreshes only rows
+-- whose mirror_changed_at moved, so every write has to bump it, including the
+-- sync scripts' PATCHes and edits made from other tools.
+-- updated_at is left alone: it feeds the public sitemap lastModified and the
+-- content-metadata API, and metadata backfills must not move it.
+
+-- 1. Column (existing rows start at the time of the migration)
+ALTER TABLE lab_articles ADD COLUMN IF NOT EXISTS mirror_changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS mirror_changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+COMMENT ON COLUMN lab_articles.mirror_changed_at IS 'Last write to the row; used by migrations/mirror.py, not for display';
+COMMENT ON COLUMN posts.mirror_changed_at IS 'Last write to the row; used by migrations/mirror.py, not for display';
+
+-- 2. Trigger functions
+CREATE OR REPLACE FUNCTION update_lab_articles_mirror_changed_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.mirror_changed_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_posts_mirror_changed_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.mirror_changed_at = NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3. Triggers
+DROP TRIGGER IF EXISTS trigger_update_lab_articles_mirror_changed_at ON lab_articles;
+CREATE TRIGGER trigger_update_lab_articles_mirror_changed_at
+  BEFORE UPDATE ON lab_articles
+  FOR EACH ROW
+  EXECUTE FUNCTION update_lab_articles_mirror_changed_at();
+
+DROP TRIGGER IF EXISTS trigger_update_posts_mirror_changed_at ON posts;
+CREATE TRIGGER trigger_update_posts_mirror_changed_at
+  BEFORE UPDATE ON posts
+  FOR EACH ROW
+  EXECUTE FUNCTION update_posts_mirror_changed_at();
+
+-- 4. Index for the mirror's incremental refresh (mirror_changed_at >= mark)
+CREATE INDEX IF NOT EXISTS idx_lab_articles_mirror_changed_at ON lab_articles(mirror_changed_at);
+CREATE INDEX IF NOT EXISTS idx_posts_mirror_changed_at ON posts(mirror_changed_at);
+
+-- Verify
+SELECT tgname, tgrelid::regclass FROM pg_trigger
+WHERE tgname IN ('trigger_update_lab_articles_mirror_changed_at', 'trigger_update_posts_mirror_changed_at');
@@ -0,0 +1,55 @@
+-- Migration: Set-based per-row updates for the sync scripts
+-- Run this in Supabase SQL Editor
+-- Used by bulk_write.py when every row gets its own value (e.g. published_at):
+-- grouping by target value can't batch those, so instead of one PATCH per row
+-- a whole chunk of (key, value) pairs is written with one UPDATE ... FROM.
+
+-- 1. Create the update function (callable as RPC)
+--    p_rows: [{"key": ..., "value": ...}, ...]; values are cast to the types
+--    of p_key_column / p_column. Returns the updated rows' key and new value.
+CREATE OR REPLACE FUNCTION bulk_set_column(
+  p_table TEXT,
+  p_key_column TEXT,
+  p_column TEXT,
+  p_rows JSONB
+)
+RETURNS TABLE (key JSONB, value JSONB)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  key_type TEXT;
+  value_type TEXT;
+BEGIN
+  IF p_table NOT IN ('lab_articles', 'posts') THEN
+    RAISE EXCEPTION 'bulk_set_column: table % is not allowed', p_table;
+  END IF;
+
+  SELECT format_type(atttypid, atttypmod) INTO key_type
+  FROM pg_attribute
+  WHERE attrelid = p_table::regclass AND attname = p_key_column AND NOT attisdropped;
+  SELECT format_type(atttypid, atttypmod) INTO value_type
+  FROM pg_attribute
+  WHERE attrelid = p_table::regclass AND attname = p_column AND NOT attisdropped;
+  IF key_type IS NULL OR value_type IS NULL THEN
+    RAISE EXCEPTION 'bulk_set_column: unknown column %.% or %.%', p_table, p_key_column, p_table, p_column;
+  END IF;
+
+  RETURN QUERY EXECUTE format(
+    'UPDATE %1$I AS t SET %3$I = v.value::%5$s
+     FROM jsonb_to_recordset($1) AS v(key TEXT, value TEXT)
+     WHERE t.%2$I = v.key::%4$s
+     RETURNING to_jsonb(t.%2$I), to_jsonb(t.%3$I)',
+    p_table, p_key_column, p_column, key_type, value_type
+  ) USING p_rows;
+END;
+$$;
+
+-- 2. Only the service role needs it
+REVOKE EXECUTE ON FUNCTION bulk_set_column(TEXT, TEXT, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION bulk_set_column(TEXT, TEXT, TEXT, JSONB) TO service_role;
+
+-- 3. Make PostgREST pick up the new function
+NOTIFY pgrst, 'reload schema';
+
+-- Verify (no-op call)
+SELECT * FROM bulk_set_column('lab_articles', 'id', 'published_at', '[]'::jsonb);
@@ -1,93 +1,112 @@
 #!/usr/bin/env python3
 """
 Analyze lab_articles to help determine content_type patterns
+
+  --plan PATH    classify and write the content_type changes to PATH, no writes
+  --apply PATH   apply a saved plan without re-classifying (see plans.py)
 """
 
-import os
 import sys
-import pathlib
-from dotenv import load_dotenv
-
-# Load environment variables
-env_path = pathlib.Path(__file__).parent.parent / '.env.local'
-if not env_path.exists():
-    env_path = pathlib.Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
 
-from supabase import create_client, Client
+from bulk_write import bulk_update, get_write_options
+from classifier import ClassifierEngine
+from clients import get_supabase
+from common import get_option
+from diff_engine import diff, make_records
+from metrics import enable_report, phase
+from mirror import read_rows, record_write
+from plans import run_apply, write_plan_file
+from reports import adjust_counts, count_values
 
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+CONTENT_TYPE_HEADINGS = {
+    'interview': '📗 INTERVIEW candidates',
+    'research': '📊 RESEARCH candidates',
+    'knowledge': '📚 KNOWLEDGE (default)',
+}
 
 def main():
+    supabase = get_supabase()
+
     print("=" * 70)
     print("Lab Articles Analysis for content_type Classification")
     print("=" * 70)
+    enable_report('analyze_articles')
     
-    # Fetch all articles
-    response = supabase.table('lab_articles').select('id, slug, title, categories, tags').execute()
-    articles = response.data
+    if run_apply(supabase, 'analyze_articles'):
+        return
     
-    print(f"\nTotal articles: {len(articles)}")
-    
-    # Keywords for classification
-    interview_keywords = ['インタビュー', 'interview', '対談', '座談会', 'に聞く', 'が語る', '密着']
-    research_keywords = ['リサーチ', 'research', '調査', 'データ', '分析', '統計', 'レポート', '実態', '動向']
-    
-    # Classify articles
-    interview_articles = []
-    research_articles = []
-    knowledge_articles = []
-    
-    for article in articles:
-        title = article['title'].lower() if article['title'] else ''
-        categories = [c.lower() for c in (article['categories'] or [])]
-        tags = [t.lower() for t in (article['tags'] or [])]
-        all_text = title + ' ' + ' '.join(categories) + ' ' + ' '.join(tags)
-        
-        is_interview = any(kw.lower() in all_text for kw in interview_keywords)
-        is_research = any(kw.lower() in all_text for kw in research_keywords)
-        
-        if is_interview:
-            interview_articles.append(article)
-        elif is_research:
-            research_articles.append(article)
-        else:
-            knowledge_articles.append(article)
-    
-    print("\n" + "=" * 70)
-    print(f"📗 INTERVIEW candidates ({len(interview_articles)} articles)")
-    print("=" * 70)
-    for a in interview_articles[:10]:
-        print(f"  - {a['title'][:60]}...")
-    if len(interview_articles) > 10:
-        print(f"  ... and {len(interview_articles) - 10} more")
-    
-    print("\n" + "=" * 70)
-    print(f"📊 RESEARCH candidates ({len(research_articles)} articles)")
-    print("=" * 70)
-    for a in research_articles[:10]:
-        print(f"  - {a['title'][:60]}...")
-    if len(research_articles) > 10:
-        print(f"  ... and {len(research_articles) - 10} more")
-    
-    print("\n" + "=" * 70)
-    print(f"📚 KNOWLEDGE (default) ({len(knowledge_articles)} articles)")
-    print("=" * 70)
-    for a in knowledge_articles[:10]:
-        print(f"  - {a['title'][:60]}...")
-    if len(knowledge_articles) > 10:
-        print(f"  ... and {len(knowledge_articles) - 10} more")
+    # --score also classifies by body text, so it needs content_html
+    score_mode = '--score' in sys.argv
+    columns = 'id, slug, title, categories, tags, content_type'
+    if score_mode:
+        columns += ', content_html'
+        try:
+            import scoring  # noqa: F401
+        except ImportError:
+            print("Error: --score needs numpy and scipy")
+            print("Run: pip install numpy scipy")
+            sys.exit(1)
+    
+    # Stream all articles (keyset-paginated, or from the local mirror with --mirror)
+    articles = read_rows(supabase, 'lab_articles', columns)
+    
+    # Classify articles in one pass with the compiled rule set
+    engine = ClassifierEngine.from_file()
+    classified = {ct: [] for ct in engine.content_types}
+    current_types = []
+    total = 0
+    
+    with phase('read_classify'):
+        for article, result in engine.classify_all(articles):
+            total += 1
+            current_types.append(article.get('content_type'))
+            article['matched'] = result
+            classified[result['content_type']].append(article)
+    
+    print(f"\nTotal articles: {total}")
+    
+    review = []
+    if score_mode:
+        with phase('score'):
+            classified, review = score_classifications(classified, engine.content_types)
+    
+    for content_type, group in classified.items():
+        print("\n" + "=" * 70)
+        print(f"{CONTENT_TYPE_HEADINGS.get(content_type, f'📄 {content_type.upper()} candidates')} ({len(group)} articles)")
+        print("=" * 70)
+        for a in group[:10]:
+            matched = a['matched']
+            if 'confidence' in a:
+                reason = f" [score: {a['confidence']:.2f}]"
+            else:
+                reason = f" [{matched['rule']}: {matched['keyword']}]" if matched['keyword'] else ""
+            print(f"  - {(a['title'] or '')[:60]}...{reason}")
+        if len(group) > 10:
+            print(f"  ... and {len(group) - 10} more")
+    
+    if review:
+        print("\n" + "=" * 70)
+        print(f"🔍 NEEDS REVIEW (low confidence, not applied) ({len(review)} articles)")
+        print("=" * 70)
+        for a in review[:20]:
+            print(f"  - {(a['title'] or '')[:50]}... → {a['scored_type']} ({a['confidence']:.2f})")
+        if len(review) > 20:
+            print(f"  ... and {len(review) - 20} more")
     
     print("\n" + "=" * 70)
     print("Summary")
     print("=" * 70)
-    print(f"  Interview:  {len(interview_articles):3} articles")
-    print(f"  Research:   {len(research_articles):3} articles")
-    print(f"  Knowledge:  {len(knowledge_articles):3} articles")
-    print(f"  Total:      {len(articles):3} articles")
+    for content_type, group in classified.items():
+        print(f"  {content_type.capitalize() + ':':<11} {len(group):3} articles")
+    if score_mode:
+        print(f"  {'Review:':<11} {len(review):3} articles")
+    print(f"  Total:      {total:3} articles")
+    
+    plan_path = get_option('--plan')
+    if plan_path:
+        write_plan_file(plan_path, 'analyze_articles', [classification_plan(classified)])
+        print(f"\n📋 Plan written to {plan_path}; apply it with --apply {plan_path}")
+        return
     
     # Ask to apply
     print("\n" + "=" * 70)
@@ -96,50 +115,82 @@ def main():
     
     if '--yes' in sys.argv:
         print("> y (auto-confirmed with --yes flag)")
-        apply_classifications(interview_articles, research_articles, knowledge_articles)
+        apply_classifications(classified, count_values(current_types))
     else:
         try:
             confirm = input("> ").strip().lower()
             if confirm == 'y':
-                apply_classifications(interview_articles, research_articles, knowledge_articles)
+                apply_classifications(classified, count_values(current_types))
             else:
                 print("Cancelled. No changes made.")
         except EOFError:
             print("\nTo apply automatically, run: python3 analyze_articles.py --yes")
 
-def apply_classifications(interview_articles, research_articles, knowledge_articles):
-    print("\nApplying classifications...")
+def score_classifications(classified, content_types):
+    """Re-label every article by body-text scoring (--score)
+    
+    The keyword classification seeds the per-type weight vectors. Articles
+    scored below --min-confidence are returned separately for human review.
+    """
+    from scoring import score_articles, DEFAULT_MIN_CONFIDENCE
+    
+    min_confidence = get_option('--min-confidence', DEFAULT_MIN_CONFIDENCE, float)
+    articles = [a for group in classified.values() for a in group]
+    seeds = [a['matched']['content_type'] for a in articles]
+    
+    print(f"\nScoring {len(articles)} articles by body text...")
+    rescored = {ct: [] for ct in content_types}
+    review = []
+    for article, (content_type, confidence) in zip(articles, score_articles(articles, seeds, content_types)):
+        article.pop('content_html', None)
+        article['scored_type'] = content_type
+        article['confidence'] = confidence
+        if confidence >= min_confidence:
+            rescored[content_type].append(article)
+        else:
+            review.append(article)
+    return rescored, review
+
+def classification_plan(classified):
+    """Diff the classification against each article's current content_type"""
+    fields = ['content_type']
+    articles = [a for group in classified.values() for a in group]
+    labels = ({'id': a['id'], 'content_type': ct} for ct, group in classified.items() for a in group)
+    return diff(make_records(labels, 'id', fields), make_records(articles, 'id', fields, 'id'),
+                'lab_articles', 'id', fields, adds=False, deletes=False)
+
+def apply_classifications(classified, type_counts):
+    """classified: {content_type: [article, ...]}
     
-    # Update interview articles
-    if interview_articles:
-        ids = [a['id'] for a in interview_articles]
-        for article_id in ids:
-            supabase.table('lab_articles').update({'content_type': 'interview'}).eq('id', article_id).execute()
-        print(f"  ✓ Set {len(ids)} articles to 'interview'")
-    
-    # Update research articles
-    if research_articles:
-        ids = [a['id'] for a in research_articles]
-        for article_id in ids:
-            supabase.table('lab_articles').update({'content_type': 'research'}).eq('id', article_id).execute()
-        print(f"  ✓ Set {len(ids)} articles to 'research'")
-    
-    # Update knowledge articles (already set, but just to be sure)
-    if knowledge_articles:
-        ids = [a['id'] for a in knowledge_articles]
-        for article_id in ids:
-            supabase.table('lab_articles').update({'content_type': 'knowledge'}).eq('id', article_id).execute()
-        print(f"  ✓ Set {len(ids)} articles to 'knowledge'")
+    type_counts is the distribution read before classifying; it is adjusted
+    from the rows each write returns instead of re-reading the table.
+    """
+    print("\nApplying classifications...")
+    supabase = get_supabase()
+    
+    # Only rows whose content_type actually changes are written, grouped by value
+    options = get_write_options()
+    for content_type, articles in classified.items():
+        if not articles:
+            continue
+        changes = [(a['id'], content_type, a.get('content_type')) for a in articles]
+        old_types = {a['id']: a.get('content_type') for a in articles}
+        unchanged = sum(1 for _, new, old in changes if new == old)
+        
+        def on_batch(value, ids):
+            record_write('lab_articles', 'id', 'content_type', value, ids)
+            adjust_counts(type_counts, old_types, value, ids)
+        
+        with phase('write'):
+            written = bulk_update(supabase, 'lab_articles', 'content_type', changes,
+                                  on_batch=on_batch, **options)
+        missed = len(articles) - unchanged - written
+        print(f"  ✓ Set {written} articles to '{content_type}' ({unchanged} unchanged"
+              f"{f', {missed} not applied' if missed else ''})")
     
     print("\n✅ Classification complete!")
     
-    # Verify
-    response = supabase.table('lab_articles').select('content_type').execute()
-    type_counts = {}
-    for a in response.data:
-        ct = a.get('content_type') or 'NULL'
-        type_counts[ct] = type_counts.get(ct, 0) + 1
-    
+    # Verified from the rows returned by the writes
     print("\nFinal distribution:")
     for ct, count in sorted(type_counts.items()):
         print(f"  - {ct}: {count} articles")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML parsing backends over saved fixture pages
+
+Usage:
+  python bench_parsers.py --save                 # download fixture pages
+  python bench_parsers.py [--fixtures DIR] [--rounds N]
+
+Each backend runs in its own process so peak memory (max RSS growth while
+parsing) is measured per backend.
+"""
+
+import multiprocessing
+import pathlib
+import re
+import resource
+import sys
+import time
+
+from common import get_option
+from html_backend import available_backends, extract_links, iter_texts
+from http_client import get_client
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / 'fixtures' / 'html'
+WP_BASE_URL = 'https://partner-prop.com'
+SAVE_URLS = [
+    f'{WP_BASE_URL}/lab/content_type/research/',
+    f'{WP_BASE_URL}/lab/content_type/interview/',
+    f'{WP_BASE_URL}/lab/content_type/knowledge/',
+]
+ARTICLE_SAMPLE = 10
+
+
+def save_fixtures(fixtures_dir):
+    """Download the listing pages and a sample of linked articles"""
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    article_urls = []
+    for url in SAVE_URLS:
+        html = get_client().get(url).text
+        name = 'listing_' + url.rstrip('/').rsplit('/', 1)[-1]
+        (fixtures_dir / f'{name}.html').write_text(html, encoding='utf-8')
+        for href, _ in extract_links(html):
+            if re.search(r'/lab/[^/]+/\d+/?$', href) and href not in article_urls:
+                article_urls.append(href)
+
+    for url in article_urls[:ARTICLE_SAMPLE]:
+        html = get_client().get(url).text
+        name = 'article_' + '_'.join(url.rstrip('/').split('/')[-2:])
+        (fixtures_dir / f'{name}.html').write_text(html, encoding='utf-8')
+
+    print(f"Saved {len(SAVE_URLS) + min(len(article_urls), ARTICLE_SAMPLE)} pages to {fixtures_dir}")
+
+
+def run_backend(backend, pages, rounds, results):
+    """Parse every page `rounds` times (links + text nodes) and report stats"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            extract_links(html, backend)
+            for _ in iter_texts(html, backend):
+                pass
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        'backend': backend,
+        'pages_per_sec': len(pages) * rounds / elapsed if elapsed else 0.0,
+        'peak_mem_kb': rss_after - rss_before,
+    })
+
+
+def main():
+    fixtures_dir = pathlib.Path(get_option('--fixtures', str(FIXTURES_DIR)))
+
+    if '--save' in sys.argv:
+        save_fixtures(fixtures_dir)
+        return
+
+    pages = [p.read_text(encoding='utf-8') for p in sorted(fixtures_dir.glob('*.html'))]
+    if not pages:
+        print(f"No fixture pages in {fixtures_dir}. Run with --save first.")
+        sys.exit(1)
+
+    rounds = get_option('--rounds', 5, int)
+    print("=" * 60)
+    print(f"Parser benchmark: {len(pages)} pages x {rounds} rounds")
+    print("=" * 60)
+
+    results = multiprocessing.Queue()
+    for backend in available_backends():
+        proc = multiprocessing.Process(target=run_backend, args=(backend, pages, rounds, results))
+        proc.start()
+        stats = results.get()
+        proc.join()
+        print(f"  {stats['backend']:<11} {stats['pages_per_sec']:8.1f} pages/sec"
+              f"   peak +{stats['peak_mem_kb'] / 1024:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Local stand-ins for WordPress and Supabase (PostgREST) used by bench_sync.py
+
+StubWordPress serves generated data for N lab articles:
+
+  /lab/content_type/<ct>/[page/<n>/]     listing pages (LISTING_PAGE_SIZE links each)
+  /lab/<category>/<id>/                  article pages with article:published_time
+  /wp-json/wp/v2/posts                   REST API posts (X-WP-Total / X-WP-TotalPages)
+  /wp-json/wp/v2/lab                     REST API lab posts
+
+StubPostgrest implements the subset of PostgREST the supabase client uses
+here: select with eq / gt / gte / is / in filters, order, limit,
+Prefer: count=exact, PATCH updates and the bulk_set_column RPC. Rows live in memory, kept ordered by
+id so keyset pages are bisected instead of scanned.
+
+Both servers are threaded, add an optional fixed latency per request and run
+in a background thread until close().
+"""
+
+import bisect
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONTENT_TYPES = ('research', 'interview', 'knowledge')
+CATEGORIES = ('optimization', 'marketing', 'sales', 'partner')
+LISTING_PAGE_SIZE = 20
+WP_API_MAX_PER_PAGE = 100
+BASE_DATE = datetime(2020, 1, 1, tzinfo=timezone(timedelta(hours=9)))
+
+
+def article_slug(post_id):
+    return f'{CATEGORIES[post_id % len(CATEGORIES)]}_{post_id}'
+
+
+def article_content_type(post_id):
+    return CONTENT_TYPES[post_id % len(CONTENT_TYPES)]
+
+
+def article_date(post_id):
+    return (BASE_DATE + timedelta(hours=post_id)).isoformat()
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that stop reading early (streamed date lookups) reset the connection
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Server:
+    """Threaded HTTP server whose handler dispatches to self.handle()"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, payload = stub.handle(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_PATCH = do_POST = _dispatch
+
+        self.httpd = _QuietServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def handle(self, method, path, headers, body):
+        """(status, headers, payload) for one request; subclasses route their paths"""
+        return 404, {}, b''
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _json(data, status=200, headers=None):
+    return status, {'Content-Type': 'application/json; charset=UTF-8', **(headers or {})}, \
+        json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class StubWordPress(_Server):
+    """Generated WordPress site with n_articles lab articles and n_posts posts"""
+
+    def __init__(self, n_articles, n_posts=None, latency=0.0, article_kb=30):
+        self.n_articles = n_articles
+        self.n_posts = n_articles if n_posts is None else n_posts
+        self.padding = '<p>' + 'x' * 1000 + '</p>'
+        self.article_kb = article_kb
+        super().__init__(latency)
+
+    def _listing(self, content_type, page):
+        ids = range(CONTENT_TYPES.index(content_type) or len(CONTENT_TYPES), self.n_articles + 1, len(CONTENT_TYPES))
+        last_page = max(1, -(-len(ids) // LISTING_PAGE_SIZE))
+        if page > last_page:
+            return 404, {}, b''
+        links = ''.join(
+            f'<li><a href="{self.url}/lab/{article_slug(i).rsplit("_", 1)[0]}/{i}/">Generated lab article number {i}</a></li>'
+            for i in ids[(page - 1) * LISTING_PAGE_SIZE:page * LISTING_PAGE_SIZE]
+        )
+        pages = ''.join(
+            f'<a class="page-numbers" href="{self.url}/lab/content_type/{content_type}/page/{n}/">{n}</a>'
+            for n in range(max(1, page - 2), min(last_page, page + 2) + 1)
+        )
+        html = f'<html><head><title>{content_type}</title></head><body><ul>{links}</ul><nav>{pages}</nav></body></html>'
+        return 200, {'Content-Type': 'text/html; charset=UTF-8'}, html.encode('utf-8')
+
+    def _article(self, post_id):
+        if not 1 <= post_id <= self.n_articles:
+            return 404, {}, b''
+        html = (
+            f'<html><head><meta property="article:published_time" content="{article_date(post_id)}">'
+            f'<title>Article {post_id}</title></head><body>{self.padding * self.article_kb}</body></html>'
+        )
+        return 200, {'Content-Type': 'text/html; charset=UTF-8'}, html.encode('utf-8')
+
+    def _api(self, post_type, query):
+        count = self.n_posts if post_type == 'posts' else self.n_articles
+        per_page = min(WP_API_MAX_PER_PAGE, int(query.get('per_page', ['10'])[0]))
+        page = int(query.get('page', ['1'])[0])
+        first = 1
+        if 'modified_after' in query:
+            # Post i was modified BASE_DATE + i hours, so the matches are a suffix
+            after = datetime.fromisoformat(query['modified_after'][0].replace('Z', '+00:00'))
+            if after.tzinfo is None:
+                after = after.replace(tzinfo=BASE_DATE.tzinfo)
+            first = max(1, int((after - BASE_DATE) // timedelta(hours=1)) + 1)
+        total = max(0, count - first + 1)
+        total_pages = -(-total // per_page)
+        if 'include' in query:
+            ids = [int(i) for i in query['include'][0].split(',') if i and int(i) <= count]
+        elif page > max(1, total_pages):
+            return _json({'code': 'rest_post_invalid_page_number'}, 400)
+        else:
+            ids = range(first + (page - 1) * per_page, min(count, first - 1 + page * per_page) + 1)
+        posts = [
+            {'id': i, 'slug': f'post-{i}' if post_type == 'posts' else article_slug(i),
+             'date': article_date(i)[:19], 'modified': article_date(i)[:19],
+             'link': (f'{self.url}/news/post-{i}/' if post_type == 'posts'
+                      else f'{self.url}/lab/{article_slug(i).rsplit("_", 1)[0]}/{i}/'),
+             'title': {'rendered': f'Generated post {i}'},
+             'content_type': [CONTENT_TYPES.index(article_content_type(i)) + 1]}
+            for i in ids
+        ]
+        return _json(posts, headers={'X-WP-Total': str(total), 'X-WP-TotalPages': str(total_pages)})
+
+    def handle(self, method, path, headers, body):
+        url = urlparse(path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts[:3] == ['wp-json', 'wp', 'v2'] and len(parts) == 4:
+            if parts[3] == 'content_type':
+                return _json([{'id': i + 1, 'slug': ct} for i, ct in enumerate(CONTENT_TYPES)])
+            return self._api(parts[3], parse_qs(url.query))
+        if parts[:2] == ['lab', 'content_type'] and len(parts) in (3, 5) and parts[2] in CONTENT_TYPES:
+            return self._listing(parts[2], int(parts[4]) if len(parts) == 5 else 1)
+        if len(parts) == 3 and parts[0] == 'lab' and parts[2].isdigit():
+            return self._article(int(parts[2]))
+        return 404, {}, b''
+
+
+def _parse_value(raw, sample):
+    """PostgREST filter value -> Python value typed like the column's sample value"""
+    raw = raw.strip('"')
+    if isinstance(sample, bool):
+        return raw == 'true'
+    if isinstance(sample, int):
+        return int(raw)
+    return raw
+
+
+class StubPostgrest(_Server):
+    """In-memory PostgREST for {table: [row, ...]} (rows need an integer id)"""
+
+    def __init__(self, tables, latency=0.0):
+        self.tables = {name: sorted(rows, key=lambda r: r['id']) for name, rows in tables.items()}
+        self._ids = {name: [r['id'] for r in rows] for name, rows in self.tables.items()}
+        # Unique-column lookups for in_() filters (id, slug are never updated here)
+        self._unique = {
+            name: {column: {r[column]: r for r in rows} for column in ('id', 'slug') if rows and column in rows[0]}
+            for name, rows in self.tables.items()
+        }
+        self._lock = threading.Lock()
+        self.patches = 0
+        self.rpcs = 0
+        super().__init__(latency)
+
+    def _filter(self, table, query):
+        rows = self.tables[table]
+        candidates = None   # rows picked through a unique index by an in_() filter
+        after = None        # keyset paging: id=gt.<after>
+        predicates = []
+        for column, values in query.items():
+            if column in ('select', 'order', 'limit', 'offset'):
+                continue
+            op, _, raw = values[0].partition('.')
+            sample = next((r.get(column) for r in rows if r.get(column) is not None), '')
+            if op == 'gt' and column == 'id':
+                after = int(raw)
+            elif op == 'in':
+                wanted = {_parse_value(v, sample) for v in raw.strip('()').split(',') if v}
+                index = self._unique[table].get(column)
+                if index is not None and candidates is None:
+                    candidates = sorted((index[v] for v in wanted if v in index), key=lambda r: r['id'])
+                else:
+                    predicates.append(lambda r, c=column, w=wanted: r.get(c) in w)
+            elif op == 'is':
+                predicates.append(lambda r, c=column: r.get(c) is None)
+            elif op in ('eq', 'gt', 'gte'):
+                value = _parse_value(raw, sample)
+                compare = {'eq': lambda a, b: a == b, 'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b}[op]
+                predicates.append(lambda r, c=column, v=value, f=compare: r.get(c) is not None and f(r.get(c), v))
+
+        if candidates is not None:
+            rows = [r for r in candidates if after is None or r['id'] > after]
+        elif after is not None:
+            rows = rows[bisect.bisect_right(self._ids[table], after):]
+        return [r for r in rows if all(p(r) for p in predicates)]
+
+    def _bulk_set_column(self, params):
+        """008_bulk_set_column.sql: set p_column per row, keyed by p_key_column"""
+        index = self._unique[params['p_table']][params['p_key_column']]
+        updated = []
+        with self._lock:
+            self.rpcs += 1
+            for pair in params['p_rows']:
+                row = index.get(pair['key'])
+                if row is not None:
+                    row[params['p_column']] = pair['value']
+                    updated.append({'key': pair['key'], 'value': pair['value']})
+        return _json(updated)
+
+    def handle(self, method, path, headers, body):
+        url = urlparse(path)
+        parts = [p for p in url.path.split('/') if p]
+        if method == 'POST' and parts[:3] == ['rest', 'v1', 'rpc']:
+            if parts[3:] == ['bulk_set_column']:
+                return self._bulk_set_column(json.loads(body or b'{}'))
+            # What PostgREST answers for a function it doesn't know
+            return _json({'code': 'PGRST202', 'message': f'Could not find the function public.{parts[-1]}',
+                          'details': None, 'hint': None}, 404)
+        if parts[:2] != ['rest', 'v1'] or len(parts) != 3 or parts[2] not in self.tables:
+            return _json({'message': f'relation {parts[-1] if parts else ""} does not exist'}, 404)
+        table = parts[2]
+        query = parse_qs(url.query)
+
+        with self._lock:
+            rows = self._filter(table, query)
+            if method == 'PATCH':
+                update = json.loads(body or b'{}')
+                for row in rows:
+                    row.update(update)
+                self.patches += 1
+                if 'return=representation' not in headers.get('Prefer', ''):
+                    return 204, {}, b''
+                columns = [c.strip() for c in query.get('select', ['*'])[0].split(',')]
+                if columns != ['*']:
+                    return _json([{c: r.get(c) for c in columns} for r in rows])
+                return _json(rows)
+
+            order = query.get('order', ['id.asc'])[0].split('.')
+            if order[0] != 'id':
+                rows = sorted(rows, key=lambda r: (r.get(order[0]) is None, r.get(order[0])),
+                              reverse=order[-1] == 'desc')
+            total = len(rows)
+            limit = int(query['limit'][0]) if 'limit' in query else None
+            rows = rows[:limit] if limit is not None else rows
+            columns = [c.strip() for c in query.get('select', ['*'])[0].split(',')]
+            if columns != ['*']:
+                rows = [{c: r.get(c) for c in columns} for r in rows]
+            else:
+                rows = [dict(r) for r in rows]
+
+        extra = {}
+        if 'count=exact' in headers.get('Prefer', ''):
+            extra['Content-Range'] = f'0-{max(0, len(rows) - 1)}/{total}'
+        return _json(rows, headers=extra)
+
+
+def post_rows(n_posts, stale_every=2):
+    """posts rows for the stubs; every stale_every-th row has no published_at"""
+    return [
+        {'id': i, 'slug': f'post-{i}', 'published_at': None if i % stale_every == 0 else article_date(i)}
+        for i in range(1, n_posts + 1)
+    ]
+
+
+def lab_article_rows(n_articles, stale_every=2):
+    """lab_articles rows for the stubs; every stale_every-th row has the wrong
+    content_type and no published_at"""
+    rows = []
+    for i in range(1, n_articles + 1):
+        stale = i % stale_every == 0
+        rows.append({
+            'id': i,
+            'slug': article_slug(i),
+            'title': f'Generated lab article number {i}',
+            'content_type': 'knowledge' if stale else article_content_type(i),
+            'published_at': None if stale else article_date(i),
+            'updated_at': article_date(i),
+        })
+    return rows
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmarks for the sync code paths
+
+Runs against local stand-ins (bench_stubs.py) instead of partner-prop.com and
+Supabase, at several archive sizes:
+
+  crawl          get_all_pages_for_content_type over every content_type listing
+  article_dates  get_lab_article_date for a sample of article pages
+  wp_api_posts   get_wp_api_posts over the REST API
+  apply_bulk     bulk_update of content_type through the supabase client
+  apply_dates    bulk_update of published_at (a different value per row)
+  apply_plan     plans.apply_plan of a diff_engine plan (re-read + write)
+  daemon_poll    one sync_daemon poll from scratch (REST sweep, diff, writes)
+
+Usage:
+  python bench_sync.py [--sizes 1000,10000,100000] [--latency-ms 0] [--only crawl,apply_plan]
+  python bench_sync.py --save-baseline fixtures/bench_baseline.json
+  python bench_sync.py --baseline fixtures/bench_baseline.json [--tolerance 0.25]
+
+With --baseline the run fails (exit 1) when any benchmark's items/sec drops
+more than --tolerance below the stored value. Fetch settings such as
+--concurrency are passed through to the code under test; request pacing is
+lifted (--rate) and the HTTP cache is off unless given explicitly.
+"""
+
+import contextlib
+import io
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+from common import get_option
+
+DEFAULT_SIZES = '1000,10000'
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_ARTICLE_SAMPLE = 1000
+BENCHMARKS = ('crawl', 'article_dates', 'wp_api_posts', 'apply_bulk', 'apply_dates', 'apply_plan', 'daemon_poll')
+# Dummy JWT-shaped key; the supabase client only checks its format
+STUB_KEY = 'bench.stub.key'
+
+
+def _prepare_environment(wp_url):
+    """Point every script at the stand-ins before any of them is imported"""
+    os.environ['NEXT_PUBLIC_SUPABASE_URL'] = 'http://127.0.0.1:9'
+    os.environ['SUPABASE_SERVICE_ROLE_KEY'] = STUB_KEY
+    sys.argv += ['--wp-base-url', wp_url]
+    if get_option('--rate') is None:
+        sys.argv += ['--rate', '100000']
+    if '--http-cache' not in sys.argv:
+        sys.argv.append('--no-http-cache')
+
+
+def _timed(run):
+    """(items, seconds) for run() -> items, with its progress output silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        items = run()
+        return items, time.perf_counter() - start
+
+
+def bench_crawl(wordpress, size):
+    from sync_content_types_from_wp import content_type_urls, get_all_pages_for_content_type
+    return sum(
+        len(get_all_pages_for_content_type(url, content_type))
+        for content_type, url in content_type_urls().items()
+    )
+
+
+def bench_article_dates(wordpress, size):
+    from bench_stubs import article_slug
+    from fetch_engine import fetch_concurrent, DEFAULT_CONCURRENCY
+    from sync_published_dates import get_lab_article_date
+    sample = min(size, get_option('--article-sample', DEFAULT_ARTICLE_SAMPLE, int))
+    slugs = [article_slug(i) for i in range(1, sample + 1)]
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    found = sum(1 for _, date in fetch_concurrent(slugs, get_lab_article_date, concurrency, rate=None) if date)
+    if found != sample:
+        raise RuntimeError(f"article_dates: {found}/{sample} dates found")
+    return sample
+
+
+def bench_wp_api_posts(wordpress, size):
+    from sync_published_dates import get_wp_api_posts
+    return len(get_wp_api_posts())
+
+
+def _stub_database(size, with_posts=False):
+    from bench_stubs import StubPostgrest, lab_article_rows, post_rows
+    from supabase import create_client
+    latency = get_option('--latency-ms', 0, float) / 1000
+    tables = {'lab_articles': lab_article_rows(size)}
+    if with_posts:
+        tables['posts'] = post_rows(size)
+    stub = StubPostgrest(tables, latency=latency)
+    return stub, create_client(stub.url, STUB_KEY)
+
+
+def bench_apply_bulk(wordpress, size):
+    from bench_stubs import article_content_type
+    from bulk_write import bulk_update, get_write_options
+    stub, supabase = _stub_database(size)
+    try:
+        changes = [(r['id'], article_content_type(r['id']), r['content_type']) for r in stub.tables['lab_articles']]
+        written = bulk_update(supabase, 'lab_articles', 'content_type', changes, **get_write_options())
+    finally:
+        stub.close()
+    return written
+
+
+def bench_apply_dates(wordpress, size):
+    from bench_stubs import article_date
+    from bulk_write import bulk_update, get_write_options
+    stub, supabase = _stub_database(size)
+    try:
+        changes = [(r['id'], article_date(r['id']), r['published_at']) for r in stub.tables['lab_articles']]
+        written = bulk_update(supabase, 'lab_articles', 'published_at', changes, **get_write_options())
+    finally:
+        stub.close()
+    return written
+
+
+def bench_apply_plan(wordpress, size):
+    from bench_stubs import article_content_type
+    from diff_engine import diff, make_records
+    from plans import apply_plan
+    stub, supabase = _stub_database(size)
+    try:
+        fields = ['content_type']
+        rows = stub.tables['lab_articles']
+        wp_rows = ({'slug': r['slug'], 'content_type': article_content_type(r['id'])} for r in rows)
+        plan = diff(make_records(wp_rows, 'slug', fields), make_records(rows, 'slug', fields, 'id'),
+                    'lab_articles', 'slug', fields)
+        stats = apply_plan(supabase, plan.to_dict())
+    finally:
+        stub.close()
+    return stats['written']
+
+
+def bench_daemon_poll(wordpress, size):
+    import journal
+    from bench_stubs import article_content_type
+    from sync_content_types_from_wp import get_content_type_terms
+    from sync_daemon import poll
+    stub, supabase = _stub_database(size, with_posts=True)
+    # High-water marks go to a scratch directory, so the poll sweeps everything
+    journal_dir = journal.JOURNAL_DIR
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            journal.JOURNAL_DIR = pathlib.Path(scratch)
+            poll(supabase, 'rest', get_content_type_terms(), dry_run=False)
+    finally:
+        journal.JOURNAL_DIR = journal_dir
+        stub.close()
+    lab = stub.tables['lab_articles']
+    wrong = sum(1 for r in lab if r['content_type'] != article_content_type(r['id']) or not r['published_at'])
+    wrong += sum(1 for r in stub.tables['posts'] if not r['published_at'])
+    if wrong:
+        raise RuntimeError(f"daemon_poll: {wrong} rows not synced")
+    return len(lab) + len(stub.tables['posts'])
+
+
+def compare(results, baseline, tolerance):
+    """Regressions as [(name, size, current, baseline)]"""
+    regressions = []
+    for name, by_size in results.items():
+        for size, result in by_size.items():
+            expected = baseline.get(name, {}).get(size)
+            if expected and result['items_per_sec'] < expected['items_per_sec'] * (1 - tolerance):
+                regressions.append((name, size, result['items_per_sec'], expected['items_per_sec']))
+    return regressions
+
+
+def main():
+    from bench_stubs import StubWordPress
+
+    sizes = [int(s) for s in get_option('--sizes', DEFAULT_SIZES).split(',')]
+    only = get_option('--only')
+    names = only.split(',') if only else list(BENCHMARKS)
+    latency = get_option('--latency-ms', 0, float) / 1000
+
+    wordpress = StubWordPress(sizes[0], latency=latency)
+    _prepare_environment(wordpress.url)
+    # Import the code under test up front so import time isn't measured
+    import plans, supabase, sync_content_types_from_wp, sync_published_dates  # noqa: F401
+
+    print("=" * 70)
+    print(f"Sync benchmarks (latency {latency * 1000:g} ms, sizes {', '.join(map(str, sizes))})")
+    print("=" * 70)
+
+    results = {}
+    for size in sizes:
+        wordpress.n_articles = wordpress.n_posts = size
+        for name in names:
+            bench = globals()[f'bench_{name}']
+            items, seconds = _timed(lambda: bench(wordpress, size))
+            rate = items / seconds if seconds else 0.0
+            results.setdefault(name, {})[str(size)] = {
+                'items': items, 'seconds': round(seconds, 4), 'items_per_sec': round(rate, 1),
+            }
+            print(f"  {name:<14} {size:>7}: {items:>7} items in {seconds:7.2f}s  {rate:10.1f} items/s")
+    wordpress.close()
+
+    save_path = get_option('--save-baseline')
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {save_path}")
+
+    baseline_path = get_option('--baseline')
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        tolerance = get_option('--tolerance', DEFAULT_TOLERANCE, float)
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {tolerance:.0%}:")
+            for name, size, current, expected in regressions:
+                print(f"   - {name} @ {size}: {current:.1f} items/s (baseline {expected:.1f})")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {tolerance:.0%} against {baseline_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Batched, minimal-diff writes for the migration / sync scripts
+
+Instead of one `update().eq(key, ...)` round trip per row, changes are
+filtered down to rows whose value actually differs, grouped by target value
+and written as `update().in_(key, chunk)` requests. Values that only one row
+gets (published_at dates are nearly unique) can't be grouped; those rows are
+written a chunk at a time through the bulk_set_column RPC
+(008_bulk_set_column.sql), falling back to one update per row when the
+function isn't installed.
+
+Every update returns the rows it changed (PostgREST return=representation,
+trimmed to the key and the written field), so a write is verified from its
+own response: keys that come back with the new value are confirmed, keys
+that don't come back (or come back with another value) are flagged as
+missed. No table has to be re-read to check the result.
+"""
+
+from collections import defaultdict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from common import get_option
+from metrics import metrics
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_PARALLELISM = 4
+BULK_SET_RPC = 'bulk_set_column'
+# PostgREST error codes for a function that isn't installed (or isn't in its
+# schema cache yet); anything else is a real failure of the call
+MISSING_FUNCTION_CODES = {'PGRST202', '42883'}
+
+# None until the first bulk_set_column call; False once it turned out missing
+_bulk_set_available = None
+_bulk_set_lock = threading.Lock()
+
+
+def get_write_options():
+    """Chunk size / parallelism from --chunk-size and --parallelism"""
+    return {
+        'chunk_size': get_option('--chunk-size', DEFAULT_CHUNK_SIZE, int),
+        'parallelism': get_option('--parallelism', DEFAULT_PARALLELISM, int),
+    }
+
+
+def group_changes(changes):
+    """Drop unchanged rows and group keys by target value
+
+    changes: iterable of (key, new_value, current_value) tuples
+    Returns {new_value: [key, ...]}
+    """
+    groups = defaultdict(list)
+    for key, new_value, current_value in changes:
+        if new_value == current_value:
+            continue
+        groups[new_value].append(key)
+    return dict(groups)
+
+
+def chunked(items, size):
+    """Split a list into lists of at most `size` items"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def same_value(returned, value):
+    """True if a value read back from the database is the value written
+
+    Timestamps come back normalized (e.g. +09:00 -> +00:00), so ISO strings
+    are compared as instants.
+    """
+    if returned == value:
+        return True
+    if isinstance(returned, str) and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(returned.replace('Z', '+00:00')) == \
+                datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return False
+    return False
+
+
+def report_missed(table, key, field):
+    """on_missed callback that prints every write that didn't take effect"""
+    def on_missed(value, keys):
+        for k in keys:
+            print(f"   ⚠️  {table} {key}={k}: {field} was not set to {value!r}")
+    return on_missed
+
+
+def bulk_update(supabase, table, field, changes, key='id',
+                chunk_size=DEFAULT_CHUNK_SIZE, parallelism=DEFAULT_PARALLELISM,
+                on_batch=None, on_missed=None):
+    """Set `field` for many rows with one in_() filtered update per (value, chunk)
+
+    Values shared by a single row are collected and written chunk_size rows
+    per bulk_set_column call instead. on_batch(value, keys) is called after each batch with the keys its
+    response confirmed; on_missed(value, keys) with the keys that were not
+    updated (no such row, blocked by a policy or trigger, ...). Missed keys
+    are printed by default.
+    Returns the number of confirmed rows.
+    """
+    on_missed = on_missed or report_missed(table, key, field)
+    groups = group_changes(changes)
+    singles = [(keys[0], value) for value, keys in groups.items() if len(keys) == 1]
+    batches = [
+        (value, chunk)
+        for value, keys in groups.items() if len(keys) > 1
+        for chunk in chunked(keys, max(1, chunk_size))
+    ]
+    batches += [(None, chunk) for chunk in chunked(singles, max(1, chunk_size))]
+
+    def settle(value, chunk, updated):
+        """Report confirmed / missed keys of one batch; returns the confirmed count"""
+        confirmed = [k for k in chunk if k in updated]
+        missed = [k for k in chunk if k not in updated]
+        metrics.count('rows_written', len(confirmed))
+        if missed:
+            metrics.count('rows_missed', len(missed))
+            on_missed(value, missed)
+        if on_batch and confirmed:
+            on_batch(value, confirmed)
+        return len(confirmed)
+
+    def write_group(value, chunk):
+        query = supabase.table(table).update({field: value}).in_(key, chunk)
+        with metrics.timed('supabase_write'):
+            rows = query.select(key, field).execute().data or []
+        updated = {row.get(key) for row in rows if same_value(row.get(field), value)}
+        return settle(value, chunk, updated)
+
+    def write_singles(pairs):
+        rows = _bulk_set(supabase, table, key, field, pairs)
+        if rows is None:
+            return sum(write_group(value, [k]) for k, value in pairs)
+        returned = {row.get('key'): row.get('value') for row in rows}
+        return sum(
+            settle(value, [k], {k} if k in returned and same_value(returned[k], value) else set())
+            for k, value in pairs
+        )
+
+    def write(batch):
+        value, chunk = batch
+        if value is None:
+            return write_singles(chunk)
+        return write_group(value, chunk)
+
+    if parallelism > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=parallelism) as pool:
+            return sum(pool.map(write, batches))
+    return sum(write(batch) for batch in batches)
+
+
+def _is_missing_function(error):
+    """True if an RPC failed because the function doesn't exist"""
+    return str(getattr(error, 'code', '')) in MISSING_FUNCTION_CODES
+
+
+def _bulk_set(supabase, table, key, field, pairs):
+    """Write (key, value) pairs with one bulk_set_column call
+
+    Returns the updated rows as [{'key': ..., 'value': ...}], or None when
+    the function isn't installed (reported once; callers then fall back to
+    one update per row). Any other error (timeout, 5xx, a bad value in the
+    batch) is raised like a failed update would be.
+    """
+    global _bulk_set_available
+    if _bulk_set_available is False:
+        return None
+    params = {
+        'p_table': table, 'p_key_column': key, 'p_column': field,
+        'p_rows': [{'key': k, 'value': value} for k, value in pairs],
+    }
+    try:
+        with metrics.timed('supabase_write'):
+            rows = supabase.rpc(BULK_SET_RPC, params).execute().data or []
+    except Exception as e:
+        if not _is_missing_function(e):
+            raise
+        with _bulk_set_lock:
+            if _bulk_set_available is None:
+                print(f"   (RPC {BULK_SET_RPC} not installed, writing one row per update: {e})")
+            _bulk_set_available = False
+        return None
+    _bulk_set_available = True
+    return rows
@@ -0,0 +1,113 @@
+"""
+Compiled keyword classifier for lab_articles content_type
+
+Rules are loaded from classification_rules.json (or --rules PATH). Each rule
+maps a set of keywords to a content_type with a priority. All keywords of all
+rules are compiled once: into one Aho-Corasick automaton when pyahocorasick
+is installed (each article's text is scanned once, regardless of how many
+rules or keywords exist), otherwise into one alternation regex per rule,
+tried in priority order. That fallback scans the text once per rule (up to
+once per content_type) rather than once in total: its cost grows with the
+number of rules, though not with the number of keywords in a rule. A single
+alternation across rules can't be used: it only reports one keyword per
+position, which can hide a shorter keyword of a higher-priority rule. The
+highest-priority rule with a match wins; articles with no match get the
+default content_type.
+
+tests/test_classifier.py checks both backends against a plain substring scan.
+"""
+
+import json
+import pathlib
+import re
+
+from common import get_option
+
+RULES_PATH = pathlib.Path(__file__).parent / 'classification_rules.json'
+
+
+def article_text(article):
+    """Lowercased title + categories + tags, as matched against the keywords"""
+    parts = [article.get('title') or '']
+    parts.extend(article.get('categories') or [])
+    parts.extend(article.get('tags') or [])
+    return ' '.join(parts).lower()
+
+
+class ClassifierEngine:
+    """Multi-keyword, priority-ordered content_type classifier"""
+
+    def __init__(self, rules, default='knowledge', backend=None):
+        """backend: 'ahocorasick' or 'regex' (default: ahocorasick if installed)"""
+        self.default = default
+        self.rules = sorted(rules, key=lambda r: -r.get('priority', 0))
+        self.content_types = list(dict.fromkeys(
+            [r['content_type'] for r in self.rules] + [default]
+        ))
+
+        # keyword -> indexes of the rules that contain it
+        self._keyword_rules = {}
+        for index, rule in enumerate(self.rules):
+            for keyword in rule['keywords']:
+                self._keyword_rules.setdefault(keyword.lower(), []).append(index)
+
+        self._automaton = None
+        self._patterns = None
+        if backend != 'regex':
+            try:
+                import ahocorasick
+                automaton = ahocorasick.Automaton()
+                for keyword in self._keyword_rules:
+                    automaton.add_word(keyword, keyword)
+                automaton.make_automaton()
+                self._automaton = automaton
+            except ImportError:
+                if backend == 'ahocorasick':
+                    raise
+        if self._automaton is None:
+            # (rule index, alternation of that rule's keywords), highest priority first
+            self._patterns = [
+                (index, re.compile('|'.join(re.escape(k.lower()) for k in rule['keywords'])))
+                for index, rule in enumerate(self.rules) if rule['keywords']
+            ]
+
+    @classmethod
+    def from_file(cls, path=None):
+        path = pathlib.Path(path or get_option('--rules', RULES_PATH))
+        config = json.loads(path.read_text(encoding='utf-8'))
+        return cls(config['rules'], config.get('default', 'knowledge'))
+
+    def _best_match(self, text):
+        """(rule index, keyword) of the highest-priority matching rule, or None"""
+        if self._patterns is not None:
+            for index, pattern in self._patterns:
+                match = pattern.search(text)
+                if match:
+                    return index, match.group(0)
+            return None
+        
+        best = None
+        for _, keyword in self._automaton.iter(text):
+            for index in self._keyword_rules[keyword]:
+                if best is None or index < best[0]:
+                    best = (index, keyword)
+            if best[0] == 0:
+                break  # the top-priority rule can't be beaten
+        return best
+
+    def classify(self, article):
+        """Returns {'content_type', 'rule', 'keyword'} (rule/keyword None for the default)"""
+        best = self._best_match(article_text(article))
+        if best is None:
+            return {'content_type': self.default, 'rule': None, 'keyword': None}
+        rule = self.rules[best[0]]
+        return {
+            'content_type': rule['content_type'],
+            'rule': rule.get('name', rule['content_type']),
+            'keyword': best[1],
+        }
+
+    def classify_all(self, articles):
+        """Yield (article, classification) for an iterable of articles in one pass"""
+        for article in articles:
+            yield article, self.classify(article)
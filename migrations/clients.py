@@ -0,0 +1,60 @@
+"""
+Lazily constructed, shared clients for the migration / sync scripts
+
+Nothing here runs at import: the .env file is read and the supabase package
+is imported the first time a client is asked for, so helpers such as
+extract_slug_from_url or parse_japanese_date import without a network
+client. get_supabase() is cached, so every module in the process (e.g.
+sync_from_wp.py and the two scripts it builds on) shares one client and its
+connection pool.
+
+The same goes for command-line options: values such as --wp-base-url are read
+when a function needs them (sync_published_dates.wp_base_url()), not at
+import. The modules import each other as top-level modules, so they are
+imported with migrations/ on sys.path, as the scripts run, not as a
+migrations.* package.
+"""
+
+import functools
+import os
+import pathlib
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+
+
+@functools.lru_cache(maxsize=None)
+def load_env():
+    """Load .env.local (or .env) from the repository root, once"""
+    from dotenv import load_dotenv
+
+    env_path = REPO_ROOT / '.env.local'
+    if not env_path.exists():
+        env_path = REPO_ROOT / '.env'
+    load_dotenv(env_path)
+
+
+def get_credentials():
+    """(url, service role key) from the environment / .env file"""
+    load_env()
+    return os.getenv('NEXT_PUBLIC_SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+
+
+@functools.lru_cache(maxsize=None)
+def get_supabase():
+    """Process-wide supabase Client; exits with an error if it can't be built"""
+    url, key = get_credentials()
+    if not url:
+        print("Error: Missing NEXT_PUBLIC_SUPABASE_URL in .env")
+        sys.exit(1)
+    if not key:
+        print("Error: Missing SUPABASE_SERVICE_ROLE_KEY in .env")
+        sys.exit(1)
+
+    try:
+        from supabase import create_client
+    except ImportError:
+        print("Error: supabase package not installed")
+        print("Run: pip install supabase")
+        sys.exit(1)
+    return create_client(url, key)
@@ -0,0 +1,16 @@
+"""
+Shared helpers for the migration / sync scripts
+"""
+
+import sys
+
+
+def get_option(name, default=None, cast=str):
+    """Read a `--name value` or `--name=value` option from sys.argv"""
+    argv = sys.argv[1:]
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            return cast(argv[i + 1])
+        if arg.startswith(name + '='):
+            return cast(arg.split('=', 1)[1])
+    return default
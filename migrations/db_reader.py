@@ -0,0 +1,85 @@
+"""
+Keyset-paginated streaming reads for Supabase tables
+
+A single `select().execute()` is silently truncated by the PostgREST row cap
+and loads the whole table at once. iter_rows() pages through a table ordered
+by its primary key (`WHERE id > last_id ORDER BY id LIMIT n`) and yields rows
+one at a time, optionally fetching the next page while the current one is
+being consumed.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from common import get_option
+from metrics import metrics
+
+DEFAULT_PAGE_SIZE = 1000
+# Keys per in_() lookup; keeps the request URL well under server limits
+DEFAULT_LOOKUP_CHUNK_SIZE = 200
+
+
+def get_read_options():
+    """Page size / prefetch from --page-size and --no-prefetch"""
+    return {
+        'page_size': get_option('--page-size', DEFAULT_PAGE_SIZE, int),
+        'prefetch': '--no-prefetch' not in sys.argv,
+    }
+
+
+def iter_rows(supabase, table, columns, key='id', where=None,
+              page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Yield every row of `table` in primary-key order
+
+    columns: select() column list; `key` is added if missing
+    where:   optional function applied to the query builder to push filters
+             down to the database, e.g. lambda q: q.is_('published_at', 'null')
+    """
+    fields = [c.strip() for c in columns.split(',')]
+    if key not in fields:
+        fields.append(key)
+    select = ', '.join(fields)
+
+    def fetch_page(after):
+        query = supabase.table(table).select(select)
+        if where:
+            query = where(query)
+        if after is not None:
+            query = query.gt(key, after)
+        with metrics.timed('supabase_read'):
+            rows = query.order(key).limit(page_size).execute().data or []
+        metrics.count('rows_read', len(rows))
+        return rows
+
+    if not prefetch:
+        after = None
+        while True:
+            rows = fetch_page(after)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1][key]
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        rows = fetch_page(None)
+        while True:
+            # The next page only depends on the last key, so start it now
+            pending = pool.submit(fetch_page, rows[-1][key]) if len(rows) == page_size else None
+            yield from rows
+            if pending is None:
+                return
+            rows = pending.result()
+
+
+def iter_rows_by_keys(supabase, table, columns, key, keys, chunk_size=DEFAULT_LOOKUP_CHUNK_SIZE):
+    """Yield the rows whose `key` is in keys, one in_() select per chunk"""
+    fields = [c.strip() for c in columns.split(',')]
+    if key not in fields:
+        fields.append(key)
+    select = ', '.join(fields)
+    keys = list(keys)
+    for i in range(0, len(keys), chunk_size):
+        with metrics.timed('supabase_read'):
+            rows = supabase.table(table).select(select).in_(key, keys[i:i + chunk_size]).execute().data or []
+        metrics.count('rows_read', len(rows))
+        yield from rows
@@ -0,0 +1,135 @@
+"""
+Sorted-merge diff between WordPress (source) and database (target) rows
+
+Rows are reduced to compact Record objects holding only the key, the target
+row id and a tuple of the compared fields. Both sides are ordered by key and
+merged in one pass into a Plan:
+
+  add     key only in the source
+  update  key on both sides and a compared field differs
+  delete  key only in the target
+
+Inputs that already arrive ordered by key can be passed with presorted=True
+and are consumed as streams; otherwise only the compact records are sorted,
+never the original row dicts. Plan.to_dict() is JSON-ready (plans.py writes
+it to plan files):
+
+  {"table": "lab_articles", "key": "slug", "fields": ["content_type"],
+   "add": [{"key": ..., "new": {...}}],
+   "update": [{"key": ..., "id": ..., "old": {...}, "new": {...}}],
+   "delete": [{"key": ..., "id": ...}]}
+
+update entries list only the fields that change.
+"""
+
+from operator import attrgetter
+
+
+class Record:
+    """One row reduced to key, target id and the compared values"""
+
+    __slots__ = ('key', 'id', 'values')
+
+    def __init__(self, key, id, values):
+        self.key = key
+        self.id = id
+        self.values = values
+
+
+def make_records(rows, key, fields, id_field=None, presorted=False):
+    """Records for rows (dicts), sorted by key unless presorted"""
+    records = (
+        Record(row[key], row.get(id_field) if id_field else None, tuple(row.get(f) for f in fields))
+        for row in rows
+    )
+    return records if presorted else sorted(records, key=attrgetter('key'))
+
+
+def _unique(records):
+    """Check key order and collapse duplicate keys (the last one wins)"""
+    pending = None
+    for record in records:
+        if pending is not None:
+            if record.key < pending.key:
+                raise ValueError(f"Records are not ordered by key: {record.key!r} after {pending.key!r}")
+            if record.key != pending.key:
+                yield pending
+        pending = record
+    if pending is not None:
+        yield pending
+
+
+class Plan:
+    """Result of a diff: adds, updates and deletes for one table"""
+
+    def __init__(self, table, key, fields):
+        self.table = table
+        self.key = key
+        self.fields = list(fields)
+        self.adds = []      # Record (source side)
+        self.updates = []   # (key, id, old values, new values)
+        self.deletes = []   # Record (target side)
+
+    def changes(self, field, by='id'):
+        """(row key or id, new, old) tuples for one field, as bulk_update takes them"""
+        i = self.fields.index(field)
+        return [
+            (row_id if by == 'id' else key, new[i], old[i])
+            for key, row_id, old, new in self.updates
+            if new[i] != old[i]
+        ]
+
+    def summary(self):
+        return {'add': len(self.adds), 'update': len(self.updates), 'delete': len(self.deletes)}
+
+    def to_dict(self):
+        def changed(values, old, new):
+            return {f: v for f, v, o, n in zip(self.fields, values, old, new) if o != n}
+
+        return {
+            'table': self.table,
+            'key': self.key,
+            'fields': self.fields,
+            'add': [{'key': r.key, 'new': dict(zip(self.fields, r.values))} for r in self.adds],
+            'update': [
+                {'key': key, 'id': row_id, 'old': changed(old, old, new), 'new': changed(new, old, new)}
+                for key, row_id, old, new in self.updates
+            ],
+            'delete': [{'key': r.key, 'id': r.id} for r in self.deletes],
+        }
+
+
+def diff(source, target, table, key, fields, adds=True, deletes=True, ignore_none=False):
+    """Merge two key-ordered record streams into a Plan
+
+    adds / deletes:  set False when absence on one side carries no meaning
+                     (e.g. the target was pre-filtered, or the source is
+                     incremental)
+    ignore_none:     a None source value means "no opinion" and never
+                     produces a change for that field
+    """
+    plan = Plan(table, key, fields)
+    source = _unique(source)
+    target = _unique(target)
+    s = next(source, None)
+    t = next(target, None)
+
+    while s is not None or t is not None:
+        if t is None or (s is not None and s.key < t.key):
+            if adds:
+                plan.adds.append(s)
+            s = next(source, None)
+        elif s is None or t.key < s.key:
+            if deletes:
+                plan.deletes.append(t)
+            t = next(target, None)
+        else:
+            new = s.values
+            if ignore_none:
+                new = tuple(o if n is None else n for n, o in zip(new, t.values))
+            if new != t.values:
+                plan.updates.append((t.key, t.id, t.values, new))
+            s = next(source, None)
+            t = next(target, None)
+
+    return plan
@@ -0,0 +1,57 @@
+"""
+Concurrent, rate-limited fetch engine for the WordPress sync scripts
+
+Replaces the serial `requests.get` + `time.sleep()` loops: work items run on a
+thread pool, every request first takes a token from a shared token bucket, and
+results are yielded back in completion order.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 5.0  # requests per second
+
+
+class TokenBucket:
+    """Thread-safe token-bucket rate limiter"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_concurrent(items, fetch, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE):
+    """Run fetch(item) for every item, yielding (item, result) in completion order
+
+    concurrency caps the number of in-flight requests, rate caps requests per
+    second across all workers (None or 0 disables rate limiting).
+    """
+    bucket = TokenBucket(rate) if rate else None
+
+    def run(item):
+        if bucket:
+            bucket.acquire()
+        return fetch(item)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(run, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
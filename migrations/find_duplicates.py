@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate lab articles with MinHash + LSH
+
+Python counterpart of scripts/check-lab-duplicates.ts for fuzzy matches:
+every article's title + body is reduced to character shingles, summarized
+as a MinHash signature, and LSH banding yields candidate pairs in
+near-linear time. The report lists clusters of similar articles with their
+estimated Jaccard similarity.
+
+Usage:
+  python find_duplicates.py [--threshold 0.8] [--json report.json]
+
+Requirements:
+  pip install numpy scipy
+"""
+
+import json
+import pathlib
+import sys
+from collections import defaultdict
+
+from clients import get_supabase
+from common import get_option
+from mirror import read_rows
+
+try:
+    from scoring import np, article_body_text, ngram_hashes
+except ImportError:
+    if __name__ != '__main__':
+        raise
+    print("Error: find_duplicates.py needs numpy and scipy")
+    print("Run: pip install numpy scipy")
+    sys.exit(1)
+
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+DENSIFY_OFFSET = 7919
+DEFAULT_THRESHOLD = 0.8
+
+
+def _mix64(h):
+    """splitmix64 finalizer: spreads the polynomial shingle hashes over all 64 bits"""
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return h ^ (h >> np.uint64(31))
+
+
+def minhash_signature(text, num_perm=NUM_PERM):
+    """One-permutation MinHash signature (num_perm uint32 values) of the text's shingles
+
+    Each shingle is hashed once, the low bits pick one of num_perm bins and
+    the high bits are min-reduced per bin, so the cost is O(shingles) rather
+    than O(shingles * num_perm). Empty bins borrow from the next non-empty
+    bin (rotation densification), offset by the distance travelled.
+    """
+    empty = np.iinfo(np.uint32).max
+    shingles = np.unique(ngram_hashes(text, (SHINGLE_SIZE,)))
+    if len(shingles) == 0:
+        return np.full(num_perm, empty, dtype=np.uint32)
+
+    hashed = _mix64(shingles)
+    bins = (hashed % np.uint64(num_perm)).astype(np.int64)
+    values = (hashed >> np.uint64(33)).astype(np.uint32)  # leaves headroom for the offset below
+    signature = np.full(num_perm, empty, dtype=np.uint32)
+    np.minimum.at(signature, bins, values)
+
+    filled = np.flatnonzero(signature != empty)
+    if len(filled) < num_perm:
+        positions = np.arange(num_perm)
+        nearest = np.searchsorted(filled, positions) % len(filled)
+        distance = (filled[nearest] - positions) % num_perm
+        signature = signature[filled[nearest]] + (distance * DENSIFY_OFFSET).astype(np.uint32)
+    return signature
+
+
+def choose_bands(threshold, num_perm=NUM_PERM):
+    """(bands, rows) with b * r == num_perm whose LSH threshold is closest to but not above `threshold`"""
+    options = [(num_perm // r, r) for r in range(1, num_perm + 1) if num_perm % r == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold] or options[:1]
+    return max(below, key=lambda br: (1 / br[0]) ** (1 / br[1]))
+
+
+def candidate_pairs(signatures, bands, rows):
+    """Index pairs sharing at least one identical LSH band"""
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for index, key in enumerate(map(bytes, chunk)):
+            buckets[key].append(index)
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    pairs.add((members[i], members[j]))
+    return pairs
+
+
+def cluster_pairs(pairs):
+    """Union-find over similar pairs -> [(member indexes, pairs within), ...]"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs:
+        parent[find(i)] = find(j)
+
+    members = defaultdict(list)
+    for x in list(parent):
+        members[find(x)].append(x)
+    # Both ends of a pair share a root, so each pair is bucketed once
+    within = defaultdict(list)
+    for pair in pairs:
+        within[find(pair[0])].append(pair)
+    return [(members[root], within[root]) for root in members]
+
+
+def find_duplicate_clusters(articles, threshold=DEFAULT_THRESHOLD):
+    """Clusters of near-duplicate articles as [{'articles': [...], 'pairs': [...]}]"""
+    texts = (a['text'] if 'text' in a else article_body_text(a) for a in articles)
+    signatures = np.vstack([minhash_signature(text) for text in texts]) \
+        if articles else np.empty((0, NUM_PERM), dtype=np.uint32)
+
+    # Articles too short to have a single shingle would all "match" each other
+    # (and land in the same bucket of every band), so they are left out of LSH
+    kept = np.flatnonzero(~(signatures == np.iinfo(np.uint32).max).all(axis=1))
+
+    bands, rows = choose_bands(threshold)
+    similar = {}
+    for a, b in candidate_pairs(signatures[kept], bands, rows):
+        i, j = int(kept[a]), int(kept[b])
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            similar[(i, j)] = similarity
+
+    clusters = []
+    for members, pairs in cluster_pairs(similar):
+        members.sort()
+        clusters.append({
+            'articles': [
+                {'slug': articles[m]['slug'], 'title': articles[m].get('title'),
+                 'is_published': articles[m].get('is_published')}
+                for m in members
+            ],
+            'pairs': [
+                {'a': articles[i]['slug'], 'b': articles[j]['slug'], 'similarity': round(similar[(i, j)], 3)}
+                for i, j in sorted(pairs)
+            ],
+        })
+    clusters.sort(key=lambda c: -max(p['similarity'] for p in c['pairs']))
+    return clusters
+
+
+def main():
+    supabase = get_supabase()
+    threshold = get_option('--threshold', DEFAULT_THRESHOLD, float)
+
+    print("=" * 70)
+    print("Lab Articles Near-Duplicate Detection (MinHash + LSH)")
+    print("=" * 70)
+
+    articles = []
+    for article in read_rows(supabase, 'lab_articles', 'id, slug, title, content_html, is_published'):
+        article['text'] = article_body_text(article)  # keep only the stripped text
+        del article['content_html']
+        articles.append(article)
+    print(f"\nTotal articles: {len(articles)}")
+
+    bands, rows = choose_bands(threshold)
+    print(f"Threshold: {threshold}  (LSH: {bands} bands x {rows} rows)")
+    clusters = find_duplicate_clusters(articles, threshold)
+
+    print("\n" + "=" * 70)
+    print(f"🔁 Duplicate clusters: {len(clusters)}")
+    print("=" * 70)
+    for cluster in clusters:
+        top = max(p['similarity'] for p in cluster['pairs'])
+        print(f"\n  Cluster ({len(cluster['articles'])} articles, max similarity {top:.2f})")
+        for a in cluster['articles']:
+            status = '公開' if a['is_published'] else '非公開'
+            print(f"   - {a['slug']} [{status}]: {(a['title'] or '')[:50]}")
+        for p in cluster['pairs']:
+            print(f"     {p['a']} ↔ {p['b']}: {p['similarity']:.2f}")
+
+    output = get_option('--json')
+    if output:
+        pathlib.Path(output).write_text(json.dumps(clusters, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\nReport written to {output}")
+
+
+if __name__ == '__main__':
+    main()
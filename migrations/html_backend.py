@@ -0,0 +1,112 @@
+"""
+Pluggable HTML parsing backends for the WordPress sync scripts
+
+Full `BeautifulSoup(html, 'html.parser')` trees are the CPU bottleneck once
+fetching is parallel. The sync scripts only need two things from a page —
+its `<a href>` links and its text nodes — so each backend implements just
+those two operations:
+
+  selectolax  lexbor-based, fastest (pip install selectolax)
+  lxml        libxml2-based (pip install lxml)
+  bs4         BeautifulSoup; links use a SoupStrainer restricted to <a href>
+
+The fastest installed backend is used unless --parser is given.
+"""
+
+from common import get_option
+from metrics import metrics
+
+BACKENDS = ('selectolax', 'lxml', 'bs4')
+
+
+def _load_selectolax():
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser as LexborHTMLParser
+    return LexborHTMLParser
+
+
+def available_backends():
+    """Installed backends, fastest first"""
+    available = []
+    try:
+        _load_selectolax()
+        available.append('selectolax')
+    except ImportError:
+        pass
+    try:
+        import lxml.html  # noqa: F401
+        available.append('lxml')
+    except ImportError:
+        pass
+    available.append('bs4')
+    return available
+
+
+_default_backend = None
+
+
+def get_backend():
+    """Backend chosen with --parser, otherwise the fastest installed one"""
+    global _default_backend
+    if _default_backend is None:
+        requested = get_option('--parser')
+        available = available_backends()
+        if requested and requested not in available:
+            print(f"  Parser '{requested}' not available, using {available[0]}")
+            requested = None
+        _default_backend = requested or available[0]
+    return _default_backend
+
+
+def extract_links(html, backend=None):
+    """All `<a href>` links in the page as [(href, text), ...]"""
+    with metrics.timed('html_parse'):
+        return _extract_links(html, backend or get_backend())
+
+
+def _extract_links(html, backend):
+
+    if backend == 'selectolax':
+        tree = _load_selectolax()(html)
+        return [
+            (node.attributes.get('href') or '', node.text(strip=True))
+            for node in tree.css('a[href]')
+        ]
+
+    if backend == 'lxml':
+        import lxml.html
+        if not html.strip():
+            return []
+        doc = lxml.html.fromstring(html)
+        return [
+            (a.get('href'), ''.join(t.strip() for t in a.itertext()))
+            for a in doc.iterfind('.//a[@href]')
+        ]
+
+    from bs4 import BeautifulSoup, SoupStrainer
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('a', href=True))
+    return [(a['href'], a.get_text(strip=True)) for a in soup.find_all('a', href=True)]
+
+
+def iter_texts(html, backend=None):
+    """Yield the page's text nodes in document order"""
+    backend = backend or get_backend()
+
+    if backend == 'selectolax':
+        tree = _load_selectolax()(html)
+        for node in tree.root.traverse(include_text=True):
+            if node.tag == '-text':
+                yield node.text(deep=False)
+        return
+
+    if backend == 'lxml':
+        import lxml.html
+        if not html.strip():
+            return
+        yield from lxml.html.fromstring(html).itertext()
+        return
+
+    from bs4 import BeautifulSoup
+    yield from BeautifulSoup(html, 'html.parser').find_all(string=True)
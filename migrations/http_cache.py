@@ -0,0 +1,176 @@
+"""
+On-disk conditional-GET cache for WordPress responses
+
+Responses that carry an ETag or Last-Modified header are stored in
+migrations/.http_cache/cache.sqlite3. The next request for the same URL sends
+If-None-Match / If-Modified-Since; a 304 is answered from the stored body, so
+re-runs only download pages that actually changed. For streamed responses
+only the prefix the caller read is stored (complete = 0); such entries only
+serve streamed requests. Entries not revalidated within --http-cache-max-age
+days are dropped, and least recently used entries are evicted while the
+cache exceeds --http-cache-max-mb (checked on open and then at most every
+EVICT_INTERVAL seconds while storing, so long-running processes stay within
+the limits).
+
+  --no-http-cache           bypass the cache
+  --http-cache-max-mb N     size limit (default 512)
+  --http-cache-max-age N    age limit in days (default 7)
+"""
+
+import json
+import pathlib
+import sqlite3
+import sys
+import threading
+import time
+
+from common import get_option
+
+CACHE_PATH = pathlib.Path(__file__).parent / '.http_cache' / 'cache.sqlite3'
+DEFAULT_MAX_MB = 512
+DEFAULT_MAX_AGE_DAYS = 7
+EVICT_INTERVAL = 60
+
+
+class HttpCache:
+    """SQLite store of response bodies keyed by URL, with size/age eviction"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 max_age=DEFAULT_MAX_AGE_DAYS * 86400):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                validated_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_http_cache_used_at ON http_cache (used_at);
+        ''')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(http_cache)')]
+        if 'complete' not in columns:
+            self.conn.execute('ALTER TABLE http_cache ADD COLUMN complete INTEGER NOT NULL DEFAULT 1')
+        self._evicted_at = 0.0
+        self.evict()
+
+    def lookup(self, url, partial=False):
+        """Stored entry for url as a dict, or None
+        
+        Prefix-only entries are returned only when partial is True.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, status, headers, body, complete FROM http_cache WHERE url = ?', (url,)
+            ).fetchone()
+        if not row or not (row[5] or partial):
+            return None
+        etag, last_modified, status, headers, body, complete = row
+        return {'url': url, 'etag': etag, 'last_modified': last_modified,
+                'status': status, 'headers': json.loads(headers), 'body': body, 'complete': bool(complete)}
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response, body=None, complete=True):
+        """Store a response if it has a validator; returns True if stored
+        
+        body defaults to the fully read response.content; streamed responses
+        pass the bytes read so far (complete=False if that is only a prefix).
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return False
+        if body is None:
+            body = response.content
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO http_cache '
+                '(url, etag, last_modified, status, headers, body, size, validated_at, used_at, complete) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, response.status_code,
+                 json.dumps(dict(response.headers)), body, len(body), now, now, int(complete)),
+            )
+            self.conn.commit()
+        if now - self._evicted_at >= EVICT_INTERVAL:
+            self.evict()
+        return True
+
+    def revalidated(self, url, not_modified):
+        """Mark an entry fresh after a 304, picking up any new validators"""
+        with self._lock:
+            now = time.time()
+            self.conn.execute(
+                'UPDATE http_cache SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), '
+                'validated_at = ?, used_at = ? WHERE url = ?',
+                (not_modified.headers.get('ETag'), not_modified.headers.get('Last-Modified'), now, now, url),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        """Drop entries past max_age, then least recently used ones over max_bytes"""
+        with self._lock:
+            self._evicted_at = time.time()
+            self.conn.execute('DELETE FROM http_cache WHERE validated_at < ?', (time.time() - self.max_age,))
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for url, size in self.conn.execute('SELECT url, size FROM http_cache ORDER BY used_at'):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((url,))
+                    total -= size
+                self.conn.executemany('DELETE FROM http_cache WHERE url = ?', doomed)
+            self.conn.commit()
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+
+def cached_response(entry):
+    """Rebuild a requests.Response from a stored entry"""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    response = requests.Response()
+    response.url = entry['url']
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = entry['body']
+    response._content_consumed = True
+    response.from_cache = True
+    return response
+
+
+_cache = None
+
+
+def get_cache():
+    """The process-wide cache unless --no-http-cache is given"""
+    global _cache
+    if _cache is None and '--no-http-cache' not in sys.argv:
+        _cache = HttpCache(
+            max_bytes=get_option('--http-cache-max-mb', DEFAULT_MAX_MB, int) * 1024 * 1024,
+            max_age=get_option('--http-cache-max-age', DEFAULT_MAX_AGE_DAYS, float) * 86400,
+        )
+    return _cache
@@ -0,0 +1,310 @@
+"""
+Shared HTTP client for all WordPress access in the sync scripts
+
+Every GET goes through one process-wide client that
+
+- paces requests with an AIMD token bucket: the rate grows additively while
+  the origin answers normally and is halved on 429 / 5xx / timeouts,
+- retries those failures with exponential backoff and full jitter,
+- honours `Retry-After` by pausing every worker, not just the one that got it,
+- reuses keep-alive connections from one pooled `requests.Session`,
+- revalidates pages stored in the on-disk cache (http_cache.py) with
+  conditional GETs and serves 304s from the stored body.
+
+Only the final outcome reaches the caller: a response (any status that is not
+retryable, or the last retryable one) or the last network exception.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from common import get_option
+from http_cache import get_cache, cached_response
+from metrics import metrics
+from fetch_engine import TokenBucket, DEFAULT_RATE
+
+DEFAULT_RETRIES = 5
+DEFAULT_TIMEOUT = 30
+# Keep-alive connections per host; enough for --concurrency plus listing prefetch
+DEFAULT_POOL_SIZE = 32
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# AIMD tuning: +1 req/s per `rate` successes (≈ +1 req/s per second at full
+# pace), halve on throttling, at most one decrease per cooldown window
+MIN_RATE = 0.5
+RATE_CEILING_FACTOR = 4
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+class AdaptiveRate(TokenBucket):
+    """Token bucket whose rate follows additive-increase / multiplicative-decrease"""
+
+    def __init__(self, rate, min_rate=MIN_RATE, max_rate=None):
+        super().__init__(rate)
+        self.min_rate = min(min_rate, self.rate)
+        self.max_rate = max(max_rate or self.rate * RATE_CEILING_FACTOR, self.rate)
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        """Wait out any Retry-After pause, then take a token"""
+        while True:
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        super().acquire()
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        """Back off after a 429 / 5xx / timeout; retry_after pauses all workers"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, never shorter than Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def _count_stream(response):
+    """Count bytes_received as a streamed response is read
+
+    Content-Length would overcount pages the caller stops reading early and
+    is absent for chunked responses; this counts what was actually consumed.
+    """
+    from requests.utils import stream_decode_response_unicode
+    iter_content = response.iter_content
+
+    def counted_iter_content(chunk_size=1, decode_unicode=False):
+        def chunks():
+            for chunk in iter_content(chunk_size):
+                metrics.count('bytes_received', len(chunk))
+                yield chunk
+        if decode_unicode:
+            return stream_decode_response_unicode(chunks(), response)
+        return chunks()
+
+    response.iter_content = counted_iter_content
+
+
+class HttpClient:
+    """Rate-adaptive, retrying GET client shared by all fetch workers"""
+
+    def __init__(self, rate=DEFAULT_RATE, max_rate=None, retries=DEFAULT_RETRIES,
+                 timeout=DEFAULT_TIMEOUT, cache=None, pool_size=DEFAULT_POOL_SIZE):
+        self.limiter = AdaptiveRate(rate, max_rate=max_rate)
+        self.cache = cache
+        # requests is imported on first use so importing the scripts stays cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.retries = retries
+        self.timeout = timeout
+        self.retried = 0
+        self._retried_lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        """GET url, retrying 429 / 5xx / timeouts / connection errors
+        
+        With the cache enabled, a stream=True response is not read ahead:
+        what the caller actually iterates is stored when the response is
+        closed (see _tap_stream), so early aborts still save the rest of the
+        body. A 304 for such a prefix entry replays the prefix and, if the
+        caller reads past it, fetches the remainder.
+        """
+        import requests
+        kwargs.setdefault('timeout', self.timeout)
+        stream = kwargs.get('stream', False)
+        cache_url = entry = None
+        if self.cache:
+            cache_url = requests.Request('GET', url, params=kwargs.get('params')).prepare().url
+            entry = self.cache.lookup(cache_url, partial=stream)
+            if entry:
+                kwargs['headers'] = {**self.cache.conditional_headers(entry), **(kwargs.get('headers') or {})}
+        
+        response = self._send(url, kwargs)
+        if entry and response.status_code == 304:
+            response.close()
+            self.cache.revalidated(cache_url, response)
+            metrics.count('http_cache_hits')
+            cached = cached_response(entry)
+            if not entry['complete']:
+                self._resume_after_prefix(cached, url, kwargs)
+            return cached
+        if stream:
+            _count_stream(response)
+        else:
+            metrics.count('bytes_received', len(response.content))
+        if cache_url and response.status_code == 200:
+            if stream:
+                self._tap_stream(response, cache_url)
+            else:
+                self.cache.store(cache_url, response)
+        return response
+
+    def _send(self, url, kwargs):
+        """One GET with pacing and retries; returns the final response"""
+        import requests
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            self.limiter.acquire()
+            metrics.count('http_requests')
+            try:
+                with metrics.timed('wp_fetch'):
+                    response = self.session.get(url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError):
+                metrics.count('http_errors')
+                self.limiter.on_throttle()
+                if last_attempt:
+                    raise
+                self._wait(attempt)
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                self.limiter.on_success()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            self.limiter.on_throttle(retry_after)
+            if last_attempt:
+                return response
+            response.close()
+            self._wait(attempt, retry_after)
+
+    def _tap_stream(self, response, cache_url):
+        """Store the bytes the caller reads from a streamed response once it is closed
+        
+        The whole body is stored if the caller read to the end, otherwise
+        the prefix it read (marked incomplete). Nothing is stored if reading
+        failed part-way.
+        """
+        from requests.utils import stream_decode_response_unicode
+        chunks = []
+        state = {'exhausted': False, 'failed': False, 'stored': False}
+        iter_content = response.iter_content
+        close = response.close
+        
+        def tapped_iter_content(chunk_size=1, decode_unicode=False):
+            def tapped():
+                try:
+                    for chunk in iter_content(chunk_size):
+                        chunks.append(chunk)
+                        yield chunk
+                except Exception:
+                    state['failed'] = True
+                    raise
+                state['exhausted'] = True
+            # The stored body is always bytes; decode for the caller afterwards
+            if decode_unicode:
+                return stream_decode_response_unicode(tapped(), response)
+            return tapped()
+        
+        def tapped_close():
+            if not state['stored'] and not state['failed'] and (chunks or state['exhausted']):
+                state['stored'] = True
+                self.cache.store(cache_url, response, body=b''.join(chunks), complete=state['exhausted'])
+            close()
+        
+        response.iter_content = tapped_iter_content
+        response.close = tapped_close
+
+    def _resume_after_prefix(self, cached, url, kwargs):
+        """Let a replayed prefix continue with the rest of the (unchanged) body"""
+        import io
+        from requests.utils import iter_slices
+        prefix = cached._content
+        # Unread state, so .content / .text go through iter_content below
+        cached._content = False
+        cached._content_consumed = False
+        cached.raw = io.BytesIO()
+        headers = {k: v for k, v in (kwargs.get('headers') or {}).items()
+                   if k not in ('If-None-Match', 'If-Modified-Since')}
+        
+        def iter_content(chunk_size=1, decode_unicode=False):
+            yield from iter_slices(prefix, chunk_size)
+            # The caller wants more than was stored: fetch again, skip the prefix
+            with self._send(url, {**kwargs, 'headers': headers, 'stream': True}) as response:
+                response.raise_for_status()
+                _count_stream(response)
+                skip = len(prefix)
+                for chunk in response.iter_content(chunk_size):
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        chunk, skip = chunk[dropped:], skip - dropped
+                    if chunk:
+                        yield chunk
+        
+        cached.iter_content = iter_content
+
+    def _wait(self, attempt, retry_after=None):
+        metrics.count('http_retries')
+        with self._retried_lock:
+            self.retried += 1
+        time.sleep(backoff_delay(attempt, retry_after))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide HttpClient configured from --rate, --max-rate, --retries
+    and the http_cache options"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                rate=get_option('--rate', DEFAULT_RATE, float),
+                max_rate=get_option('--max-rate', None, float),
+                retries=get_option('--retries', DEFAULT_RETRIES, int),
+                cache=get_cache(),
+            )
+        return _client
+
+
+def configure_client(rate, max_rate=None):
+    """(Re)build the process-wide client with an explicit rate instead of the
+    command-line defaults; call it before the first request"""
+    global _client
+    with _client_lock:
+        _client = HttpClient(
+            rate=rate,
+            max_rate=max_rate,
+            retries=get_option('--retries', DEFAULT_RETRIES, int),
+            cache=get_cache(),
+        )
+        return _client
@@ -0,0 +1,107 @@
+"""
+On-disk checkpoint journal for resumable syncs
+
+Each fetched result and each applied write is appended to a JSONL file as
+soon as it happens. Running a script again with --resume replays the journal
+so work that is already done is skipped. Without --resume a fresh journal is
+started, and a run that completes removes its journal.
+
+  {"op": "fetched", "scope": "lab_articles", "key": "optimization_950", "value": "2023-03-28T00:00:00+09:00"}
+  {"op": "applied", "scope": "lab_articles", "keys": ["optimization_950", ...]}
+
+Incremental syncs also keep a high-water mark per script (<name>.high_water):
+the newest source timestamp seen by the last completed run.
+"""
+
+import json
+import pathlib
+import sys
+import threading
+from collections import defaultdict
+
+from common import get_option
+
+JOURNAL_DIR = pathlib.Path(__file__).parent / '.journal'
+
+
+class Journal:
+    """Append-only JSONL journal of fetched results and applied writes"""
+
+    def __init__(self, path, resume=False):
+        self.path = pathlib.Path(path)
+        self.fetched = defaultdict(dict)
+        self.applied = defaultdict(set)
+        self._lock = threading.Lock()
+
+        if resume and self.path.exists():
+            self._load()
+        elif self.path.exists():
+            self.path.unlink()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() and not self.path.read_bytes().endswith(b'\n'):
+            self._file.write('\n')  # terminate a line cut short by a crash
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # last line may be cut short by a crash
+                if entry.get('op') == 'fetched':
+                    self.fetched[entry['scope']][entry['key']] = entry.get('value')
+                elif entry.get('op') == 'applied':
+                    self.applied[entry['scope']].update(entry['keys'])
+
+    def _append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def record_fetched(self, scope, key, value):
+        self.fetched[scope][key] = value
+        self._append({'op': 'fetched', 'scope': scope, 'key': key, 'value': value})
+
+    def record_applied(self, scope, keys):
+        keys = list(keys)
+        self.applied[scope].update(keys)
+        self._append({'op': 'applied', 'scope': scope, 'keys': keys})
+
+    def is_done(self, scope, key):
+        """Already fetched or applied in a previous (resumed) run"""
+        return key in self.applied[scope] or key in self.fetched[scope]
+
+    def close(self):
+        self._file.close()
+
+    def finish(self):
+        """Close and remove the journal after a successful run"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def open_journal(name):
+    """Journal for a script (--journal PATH overrides, --resume replays it)"""
+    path = get_option('--journal', JOURNAL_DIR / f'{name}.jsonl', pathlib.Path)
+    resume = '--resume' in sys.argv
+    journal = Journal(path, resume=resume)
+    if resume:
+        done = sum(len(v) for v in journal.fetched.values())
+        applied = sum(len(v) for v in journal.applied.values())
+        print(f"  ↻ Resuming from {path} ({done} fetched, {applied} applied)")
+    return journal
+
+
+def read_high_water(name):
+    """High-water mark saved by the last completed run of a script, or None"""
+    path = JOURNAL_DIR / f'{name}.high_water'
+    if not path.exists():
+        return None
+    return path.read_text(encoding='utf-8').strip() or None
+
+
+def write_high_water(name, value):
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    (JOURNAL_DIR / f'{name}.high_water').write_text(value, encoding='utf-8')
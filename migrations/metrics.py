@@ -0,0 +1,182 @@
+"""
+Run metrics for the migration / sync scripts
+
+Phases, request latencies and counters are collected in-process. With
+--metrics PATH a report is written at exit: Prometheus textfile format when
+PATH ends in .prom (for node_exporter's textfile collector), JSON otherwise.
+
+  phases        wall time per named phase (phase() context manager, or
+                mark() to switch phases in a linear script)
+  latencies     per-operation samples -> count, sum, p50/p95/p99
+                (wp_fetch, html_parse, supabase_read, supabase_write, ...)
+                count and sum are cumulative; the quantiles cover the samples
+                since clear_samples() (long-running processes call it after
+                every report so memory stays bounded)
+  counters      bytes received, retries, cache hits, rows read/written, ...
+
+rows_written_per_sec is rows_written over the 'write' phase (or the whole run
+when a script has no such phase).
+"""
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from common import get_option
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'pp_migration'
+
+
+def quantile(sorted_samples, q):
+    """Nearest-rank quantile of an already sorted list"""
+    if not sorted_samples:
+        return None
+    return sorted_samples[max(0, math.ceil(q * len(sorted_samples)) - 1)]
+
+
+class Metrics:
+    """Thread-safe collector of phase timings, latency samples and counters"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.phases = {}
+        self.latencies = {}
+        self._latency_totals = {}
+        self.counters = {}
+        self._mark = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def mark(self, name):
+        """End the current marked phase (if any) and start `name` (None just ends it)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._mark:
+                previous, start = self._mark
+                self.phases[previous] = self.phases.get(previous, 0.0) + now - start
+            self._mark = (name, now) if name else None
+
+    @contextmanager
+    def timed(self, name):
+        """Record the duration of the enclosed block as one latency sample"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            totals = self._latency_totals.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def clear_samples(self):
+        """Drop the latency samples behind the quantiles (totals are kept)"""
+        with self._lock:
+            self.latencies = {}
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self, script):
+        self.mark(None)
+        with self._lock:
+            duration = time.monotonic() - self.started
+            latencies = {}
+            for name, (count, total) in self._latency_totals.items():
+                ordered = sorted(self.latencies.get(name, ()))
+                latencies[name] = {
+                    'count': count,
+                    'sum': total,
+                    **{f'p{int(q * 100)}': quantile(ordered, q) for q in QUANTILES},
+                }
+            counters = dict(self.counters)
+            phases = dict(self.phases)
+
+        write_time = phases.get('write') or duration
+        return {
+            'script': script,
+            'started_at': self.started_at,
+            'duration_seconds': duration,
+            'phases': phases,
+            'latencies': latencies,
+            'counters': counters,
+            'rows_written_per_sec': counters.get('rows_written', 0) / write_time if write_time else 0.0,
+        }
+
+
+def to_prometheus(report):
+    """Render a report in the Prometheus text exposition format"""
+    script = report['script']
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{v}"' for k, v in {'script': script, **labels}.items())
+            lines.append(f'{METRIC_PREFIX}_{name}{{{label_text}}} {value}')
+
+    metric('duration_seconds', 'gauge', 'Wall time of the last run', [({}, report['duration_seconds'])])
+    metric('phase_seconds', 'gauge', 'Wall time per phase',
+           [({'phase': p}, s) for p, s in report['phases'].items()])
+    lines.append(f'# HELP {METRIC_PREFIX}_latency_seconds Per-operation latency')
+    lines.append(f'# TYPE {METRIC_PREFIX}_latency_seconds summary')
+    for op, stats in report['latencies'].items():
+        base = f'script="{script}",op="{op}"'
+        for q in QUANTILES:
+            value = stats[f'p{int(q * 100)}']
+            # No samples since the last clear_samples()
+            value = 'NaN' if value is None else value
+            lines.append(f'{METRIC_PREFIX}_latency_seconds{{{base},quantile="{q}"}} {value}')
+        lines.append(f'{METRIC_PREFIX}_latency_seconds_sum{{{base}}} {stats["sum"]}')
+        lines.append(f'{METRIC_PREFIX}_latency_seconds_count{{{base}}} {stats["count"]}')
+    for name, value in report['counters'].items():
+        metric(f'{name}_total', 'counter', name.replace('_', ' ').capitalize(), [({}, value)])
+    metric('rows_written_per_second', 'gauge', 'Rows written per second of write phase',
+           [({}, report['rows_written_per_sec'])])
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(path, script):
+    # Written to a temp file and renamed so collectors never read a partial file
+    report = metrics.report(script)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if str(path).endswith('.prom'):
+            f.write(to_prometheus(report))
+        else:
+            json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def enable_report(script):
+    """Write the report to --metrics PATH when the script exits"""
+    path = get_option('--metrics')
+    if path:
+        atexit.register(write_report, path, script)
+
+
+# Process-wide collector used by the shared modules and scripts
+metrics = Metrics()
+phase = metrics.phase
+mark = metrics.mark
@@ -0,0 +1,214 @@
+"""
+Local SQLite mirror of lab_articles and posts
+
+With --mirror, reads go to migrations/.mirror/mirror.sqlite3 instead of
+Supabase. Before the first read of a table in a process the mirror is
+refreshed incrementally: only rows with mirror_changed_at >= the stored
+high-water mark are fetched, and a cheap exact-count check detects deleted rows. Rows
+come back as the same dicts the scripts get from Supabase. Writes still go to
+the live database and are mirrored locally through record_write().
+
+The refresh relies on every write bumping mirror_changed_at, including writes
+from processes that run without --mirror (sync_daemon.py, other tools). The
+column and its BEFORE UPDATE triggers come from 007_mirror_changed_at.sql.
+updated_at is not used: the site shows it (sitemap lastModified), so the
+scripts' metadata writes must not move it.
+
+  --mirror        read through the mirror
+  --mirror-full   rebuild the mirror from scratch first
+"""
+
+import json
+import pathlib
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+from db_reader import iter_rows, get_read_options
+
+MIRROR_PATH = pathlib.Path(__file__).parent / '.mirror' / 'mirror.sqlite3'
+
+# Columns kept in the mirror (large bodies such as content_html are left out)
+MIRROR_COLUMNS = {
+    'lab_articles': ['id', 'slug', 'title', 'categories', 'tags', 'content_type',
+                     'is_published', 'published_at', 'original_url', 'updated_at'],
+    'posts': ['id', 'slug', 'title', 'type', 'is_published', 'published_at', 'updated_at'],
+}
+
+# Column the incremental refresh keys off (007_mirror_changed_at.sql)
+CHANGED_COLUMN = 'mirror_changed_at'
+
+INSERT_BATCH_SIZE = 1000
+# Bumped when the SQLite layout or the refresh column changes; older mirror
+# files are rebuilt from scratch
+SCHEMA_VERSION = 2
+
+
+class Mirror:
+    """SQLite copy of selected Supabase tables, refreshed by mirror_changed_at"""
+
+    def __init__(self, path=MIRROR_PATH):
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._refreshed = set()
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS mirror_rows;
+                DROP TABLE IF EXISTS mirror_refreshes;
+            ''')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS mirror_rows (
+                tbl TEXT NOT NULL,
+                id TEXT NOT NULL,
+                slug TEXT,
+                changed_at TEXT,
+                data TEXT NOT NULL,
+                PRIMARY KEY (tbl, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_mirror_rows_slug ON mirror_rows (tbl, slug);
+            CREATE TABLE IF NOT EXISTS mirror_refreshes (
+                tbl TEXT PRIMARY KEY,
+                high_water TEXT,
+                refreshed_at TEXT
+            );
+        ''')
+
+    def high_water(self, table):
+        row = self.conn.execute(
+            'SELECT high_water FROM mirror_refreshes WHERE tbl = ?', (table,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def local_count(self, table):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM mirror_rows WHERE tbl = ?', (table,)
+        ).fetchone()[0]
+
+    def refresh(self, supabase, table, full=False):
+        """Pull rows changed since the last refresh; returns the number fetched"""
+        high_water = None if full else self.high_water(table)
+        where = (lambda q: q.gte(CHANGED_COLUMN, high_water)) if high_water else None
+        columns = ', '.join([*MIRROR_COLUMNS[table], CHANGED_COLUMN])
+
+        with self._lock:
+            if full:
+                self.conn.execute('DELETE FROM mirror_rows WHERE tbl = ?', (table,))
+
+            fetched = 0
+            batch = []
+            for row in iter_rows(supabase, table, columns, where=where, **get_read_options()):
+                changed_at = row.pop(CHANGED_COLUMN, None)
+                if changed_at and (high_water is None or changed_at > high_water):
+                    high_water = changed_at
+                batch.append((table, str(row['id']), row.get('slug'), changed_at,
+                              json.dumps(row, ensure_ascii=False)))
+                fetched += 1
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    self._upsert(batch)
+                    batch = []
+            self._upsert(batch)
+
+            self._drop_deleted(supabase, table)
+            self.conn.execute(
+                'INSERT OR REPLACE INTO mirror_refreshes (tbl, high_water, refreshed_at) VALUES (?, ?, ?)',
+                (table, high_water, datetime.now(timezone.utc).isoformat()),
+            )
+            self.conn.commit()
+
+        self._refreshed.add(table)
+        return fetched
+
+    def _upsert(self, batch):
+        if batch:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO mirror_rows (tbl, id, slug, changed_at, data) VALUES (?, ?, ?, ?, ?)',
+                batch,
+            )
+
+    def _drop_deleted(self, supabase, table):
+        # Deletes don't leave a changed row behind; only reconcile ids when the counts disagree
+        remote = supabase.table(table).select('id', count='exact').limit(1).execute().count
+        if remote is None or remote == self.local_count(table):
+            return
+        remote_ids = {str(r['id']) for r in iter_rows(supabase, table, 'id', **get_read_options())}
+        local_ids = [r[0] for r in self.conn.execute('SELECT id FROM mirror_rows WHERE tbl = ?', (table,))]
+        deleted = [(table, i) for i in local_ids if i not in remote_ids]
+        self.conn.executemany('DELETE FROM mirror_rows WHERE tbl = ? AND id = ?', deleted)
+
+    def ensure_fresh(self, supabase, table):
+        if table not in self._refreshed:
+            full = '--mirror-full' in sys.argv
+            fetched = self.refresh(supabase, table, full=full)
+            print(f"   🗄  Mirror {table}: {fetched} rows refreshed, {self.local_count(table)} total")
+
+    def iter_rows(self, table, fields):
+        """Yield mirrored rows (only `fields`) ordered by id as text
+
+        ids are stored as TEXT, so the order is lexicographic ('10' before
+        '2'), not numeric and not the order of a live iter_rows() read. It is
+        stable, which is all a keyset walk needs; callers that merge by key
+        sort themselves (diff_engine.make_records does).
+        """
+        cursor = self.conn.execute(
+            'SELECT data FROM mirror_rows WHERE tbl = ? ORDER BY id', (table,)
+        )
+        for (data,) in cursor:
+            row = json.loads(data)
+            yield {f: row.get(f) for f in fields}
+
+    def apply_write(self, table, key, field, value, keys):
+        """Mirror a live `update({field: value}).in_(key, keys)`"""
+        column = 'id' if key == 'id' else 'slug'
+        with self._lock:
+            for k in keys:
+                for row_id, data in self.conn.execute(
+                    f'SELECT id, data FROM mirror_rows WHERE tbl = ? AND {column} = ?', (table, str(k))
+                ).fetchall():
+                    row = json.loads(data)
+                    row[field] = value
+                    self.conn.execute(
+                        'UPDATE mirror_rows SET data = ? WHERE tbl = ? AND id = ?',
+                        (json.dumps(row, ensure_ascii=False), table, row_id),
+                    )
+            self.conn.commit()
+
+
+_mirror = None
+
+
+def get_mirror():
+    """The process-wide mirror when --mirror is given, otherwise None"""
+    global _mirror
+    if _mirror is None and ('--mirror' in sys.argv or '--mirror-full' in sys.argv):
+        _mirror = Mirror()
+    return _mirror
+
+
+def read_rows(supabase, table, columns, where=None, predicate=None):
+    """Stream rows from the mirror (--mirror) or from Supabase
+
+    where:     query hook pushed down to Supabase on live reads
+    predicate: row filter applied in Python; it must express the same
+               condition as `where` so both paths return the same rows
+    """
+    fields = [c.strip() for c in columns.split(',')]
+    mirror = get_mirror()
+    if mirror and table in MIRROR_COLUMNS and set(fields) <= set(MIRROR_COLUMNS[table]):
+        mirror.ensure_fresh(supabase, table)
+        rows = mirror.iter_rows(table, fields)
+    else:
+        rows = iter_rows(supabase, table, columns, where=where, **get_read_options())
+    if predicate:
+        rows = (r for r in rows if predicate(r))
+    return rows
+
+
+def record_write(table, key, field, value, keys):
+    """Keep the mirror in step with a live bulk write (no-op without --mirror)"""
+    mirror = get_mirror()
+    if mirror:
+        mirror.apply_write(table, key, field, value, keys)
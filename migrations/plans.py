@@ -0,0 +1,136 @@
+"""
+Saved change plans: compute once with --plan, execute later with --apply
+
+  python sync_content_types_from_wp.py --plan plan.json   # crawl + diff, no writes
+  python sync_content_types_from_wp.py --apply plan.json  # writes only
+
+A plan file holds one diff_engine Plan per table plus the script that made it:
+
+  {"script": "sync_content_types_from_wp", "created_at": "...",
+   "high_water": null, "plans": [{"table": "lab_articles", ...}]}
+
+Apply re-reads the current values of every planned row (batched in_()
+selects). Entries whose current value already equals the new value are
+counted as done. Entries whose current value no longer matches the planned
+old value are skipped as stale. The rest are written with bulk_update, and
+entries that its responses don't confirm are counted (and listed) as missed.
+Only updates are applied; adds and deletes are informational.
+
+The plan's high-water mark is saved only when every entry ended up written
+or already applied. Missed entries have to be retried. Stale entries mean
+the plan is out of date for those rows. Either way the mark stays put, so
+the next --plan run diffs the same range again against the current rows.
+"""
+
+import json
+import sys
+from datetime import datetime, timezone
+
+from bulk_write import bulk_update, get_write_options, report_missed, same_value
+from common import get_option
+from db_reader import iter_rows_by_keys
+from journal import write_high_water
+from metrics import phase
+from mirror import record_write
+
+
+def write_plan_file(path, script, plans, high_water=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'script': script,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'high_water': high_water,
+            'plans': [plan.to_dict() for plan in plans],
+        }, f, ensure_ascii=False, indent=2)
+
+
+def load_plan_file(path, script):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('script') != script:
+        print(f"Error: {path} was made by {data.get('script')}, not {script}")
+        sys.exit(1)
+    return data
+
+
+def apply_plan(supabase, plan, options=None):
+    """Apply the updates of one plan dict; returns {'written', 'done', 'stale', 'missed'} counts"""
+    table = plan['table']
+    updates = plan['update']
+    stats = {'written': 0, 'done': 0, 'stale': 0, 'missed': 0}
+    if not updates:
+        return stats
+
+    # Write by primary key when the plan has ids for every row, else by the diff key
+    by_id = all(u.get('id') is not None for u in updates)
+    write_key = 'id' if by_id else plan['key']
+    fields = sorted({f for u in updates for f in u['new']})
+    keys = [u['id'] if by_id else u['key'] for u in updates]
+
+    current = {
+        row[write_key]: row
+        for row in iter_rows_by_keys(supabase, table, ', '.join(fields), write_key, keys)
+    }
+
+    changes = {field: [] for field in fields}
+    for row_key, update in zip(keys, updates):
+        row = current.get(row_key)
+        if row is None:
+            stats['stale'] += 1
+            continue
+        # Read-back values are normalized (timestamps come back as UTC)
+        if all(same_value(row.get(f), new) for f, new in update['new'].items()):
+            stats['done'] += 1
+        elif any(not same_value(row.get(f), update['old'].get(f)) for f in update['new']):
+            stats['stale'] += 1
+        else:
+            for f, new in update['new'].items():
+                changes[f].append((row_key, new, row.get(f)))
+            stats['written'] += 1
+
+    options = options or get_write_options()
+    missed = set()
+    for field, field_changes in changes.items():
+        if field_changes:
+            flag = report_missed(table, write_key, field)
+            
+            def on_missed(value, keys, flag=flag):
+                flag(value, keys)
+                missed.update(keys)
+            
+            bulk_update(
+                supabase, table, field, field_changes, key=write_key,
+                on_batch=lambda value, ids, field=field: record_write(table, write_key, field, value, ids),
+                on_missed=on_missed, **options,
+            )
+    stats['written'] -= len(missed)
+    stats['missed'] = len(missed)
+    return stats
+
+
+def run_apply(supabase, script):
+    """Handle --apply PATH for a script; returns True if a plan was applied"""
+    path = get_option('--apply')
+    if not path:
+        return False
+
+    data = load_plan_file(path, script)
+    print(f"\n📋 Applying plan {path} (created {data['created_at']})")
+    unsettled = 0
+    for plan in data['plans']:
+        with phase('write'):
+            stats = apply_plan(supabase, plan)
+        print(f"   {plan['table']}: {stats['written']} written, {stats['done']} already applied, "
+              f"{stats['stale']} stale (skipped), {stats['missed']} did not take effect")
+        unsettled += stats['stale'] + stats['missed']
+        ignored = len(plan['add']) + len(plan['delete'])
+        if ignored:
+            print(f"   {plan['table']}: {ignored} add/delete entries are not applied")
+
+    if data.get('high_water'):
+        if unsettled:
+            print(f"   ⚠️  High-water mark not advanced ({unsettled} stale / missed entries); "
+                  f"make a new plan to pick them up")
+        else:
+            write_high_water(script, data['high_water'])
+    return True
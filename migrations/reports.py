@@ -0,0 +1,56 @@
+"""
+Database-side reports for the migration / sync scripts
+"""
+
+import threading
+
+from db_reader import iter_rows, get_read_options
+
+CONTENT_TYPE_COUNTS_RPC = 'lab_article_content_type_counts'
+
+
+def get_content_type_counts(supabase):
+    """content_type distribution of lab_articles as {content_type: count}
+
+    Uses the grouped count from 006_content_type_counts.sql; falls back to
+    counting a streamed content_type column when the function isn't installed.
+    """
+    try:
+        rows = supabase.rpc(CONTENT_TYPE_COUNTS_RPC, {}).execute().data or []
+        return {(r.get('content_type') or 'NULL'): r['article_count'] for r in rows}
+    except Exception as e:
+        print(f"   (RPC {CONTENT_TYPE_COUNTS_RPC} unavailable, counting client-side: {e})")
+
+    type_counts = {}
+    for a in iter_rows(supabase, 'lab_articles', 'content_type', **get_read_options()):
+        ct = a.get('content_type') or 'NULL'
+        type_counts[ct] = type_counts.get(ct, 0) + 1
+    return type_counts
+
+
+def count_values(values):
+    """{value: count} for already-read values (None is counted as 'NULL')"""
+    counts = {}
+    for value in values:
+        value = value or 'NULL'
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+_adjust_lock = threading.Lock()
+
+
+def adjust_counts(counts, old_values, new_value, keys):
+    """Move confirmed writes from their old value's count to new_value's
+
+    old_values maps each key to its value before the write. Meant to be
+    called from bulk_update's on_batch (possibly from several threads), so
+    a distribution read before the writes stays current without a re-read.
+    """
+    with _adjust_lock:
+        for key in keys:
+            old = old_values[key] or 'NULL'
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+            counts[new_value or 'NULL'] = counts.get(new_value or 'NULL', 0) + 1
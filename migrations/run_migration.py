@@ -9,48 +9,25 @@ Requirements:
   pip install python-dotenv supabase
 """
 
-import os
-import sys
-from dotenv import load_dotenv
-
-# Load environment variables from parent directory
-import pathlib
-env_path = pathlib.Path(__file__).parent.parent / '.env.local'
-if not env_path.exists():
-    env_path = pathlib.Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
-
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-if not SUPABASE_URL:
-    print("Error: Missing NEXT_PUBLIC_SUPABASE_URL in .env")
-    sys.exit(1)
-    
-if not SUPABASE_SERVICE_KEY:
-    print("Error: Missing SUPABASE_SERVICE_ROLE_KEY in .env")
-    sys.exit(1)
-
-try:
-    from supabase import create_client, Client
-except ImportError:
-    print("Error: supabase package not installed")
-    print("Run: pip install supabase")
-    sys.exit(1)
+from clients import get_supabase
+from metrics import enable_report, phase
+from reports import get_content_type_counts
 
 def main():
     print("=" * 60)
     print("Supabase Migration: Add content_type to lab_articles")
     print("=" * 60)
+    enable_report('run_migration')
     
     # Create Supabase client
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    supabase = get_supabase()
     
     # First check if column exists by trying to select it
     print("\n1. Checking if content_type column exists...")
     
     try:
-        response = supabase.table('lab_articles').select('id, slug, content_type').limit(5).execute()
+        with phase('check'):
+            response = supabase.table('lab_articles').select('id, slug, content_type').limit(5).execute()
         print("   ✓ content_type column already exists!")
         
         if response.data:
@@ -59,12 +36,9 @@ def main():
                 content_type = article.get('content_type') or 'NULL'
                 print(f"   - {article['slug']}: content_type = {content_type}")
                 
-            # Count by content_type
-            all_articles = supabase.table('lab_articles').select('content_type').execute()
-            type_counts = {}
-            for a in all_articles.data:
-                ct = a.get('content_type') or 'NULL'
-                type_counts[ct] = type_counts.get(ct, 0) + 1
+            # Count by content_type (grouped in the database, see 006_content_type_counts.sql)
+            with phase('count'):
+                type_counts = get_content_type_counts(supabase)
             
             print("\n   Content type distribution:")
             for ct, count in sorted(type_counts.items()):
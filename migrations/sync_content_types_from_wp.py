@@ -2,39 +2,58 @@
 """
 Sync content_type from WordPress site
 Scrapes the WordPress content_type pages and updates the database accordingly
+
+  --discovery listing   crawl every content_type listing page (default)
+  --discovery sitemap   read the lab sitemaps and only look up articles whose
+                        lastmod is newer than the last completed run (or --since)
+  --plan PATH           write the computed changes to PATH and stop
+  --apply PATH          skip crawling and apply a saved plan (see plans.py)
 """
 
-import os
 import re
 import sys
-import pathlib
-import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from bulk_write import bulk_update, chunked, get_write_options
+from clients import get_supabase
+from common import get_option
+from diff_engine import diff, make_records
+from fetch_engine import fetch_concurrent, DEFAULT_CONCURRENCY
+from html_backend import extract_links
+from http_client import get_client
+from journal import open_journal, read_high_water, write_high_water
+from metrics import enable_report, phase
+from mirror import read_rows, record_write
+from plans import run_apply, write_plan_file
+from published_date import normalize_iso_date
+from reports import adjust_counts, count_values
+from sitemap import iter_sitemap
+from sync_published_dates import WP_LAB_POST_TYPE, lab_post_id, wp_base_url
+
+# WordPress content types (each has a listing at /lab/content_type/<type>/)
+CONTENT_TYPES = ('research', 'interview', 'knowledge')
 
-# Load environment variables
-env_path = pathlib.Path(__file__).parent.parent / '.env.local'
-if not env_path.exists():
-    env_path = pathlib.Path(__file__).parent.parent / '.env'
-load_dotenv(env_path)
+ARTICLE_LINK_RE = re.compile(r'/lab/[^/]+/\d+/?$')
+PAGE_LINK_RE = re.compile(r'/page/(\d+)/?$')
 
-from supabase import create_client, Client
+# Listing pages fetched ahead of the one being parsed
+DEFAULT_PREFETCH = 2
 
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+# REST base of the content_type taxonomy and posts looked up per include= request
+CONTENT_TYPE_TAXONOMY = 'content_type'
+WP_API_INCLUDE_BATCH = 100
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    print("Error: Missing Supabase credentials")
-    sys.exit(1)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+def content_type_urls():
+    """{content_type: listing URL} on the configured WordPress site"""
+    base = wp_base_url()
+    return {ct: f'{base}/lab/content_type/{ct}/' for ct in CONTENT_TYPES}
 
-# WordPress content type pages
-CONTENT_TYPE_URLS = {
-    'research': 'https://partner-prop.com/lab/content_type/research/',
-    'interview': 'https://partner-prop.com/lab/content_type/interview/',
-    'knowledge': 'https://partner-prop.com/lab/content_type/knowledge/',
-}
+
+def sitemap_url():
+    """--sitemap, or the site's core sitemap index"""
+    return get_option('--sitemap', f'{wp_base_url()}/wp-sitemap.xml')
 
 def extract_slug_from_url(url):
     """Extract slug from WordPress article URL like /lab/category/123/"""
@@ -51,135 +70,307 @@ def get_articles_from_wp_page(url, content_type):
     print(f"\n  Fetching: {url}")
     
     try:
-        response = requests.get(url, timeout=30)
+        response = get_client().get(url)
         response.raise_for_status()
     except Exception as e:
         print(f"  Error fetching {url}: {e}")
         return []
     
-    soup = BeautifulSoup(response.text, 'html.parser')
+    links, _ = parse_listing_page(response.text, url)
     articles = []
+    seen = set()
     
-    # Find all article links - look for links to /lab/category/id/ pattern
-    for link in soup.find_all('a', href=True):
-        href = link['href']
-        if '/lab/' in href and re.search(r'/lab/[^/]+/\d+/?$', href):
-            slug = extract_slug_from_url(href)
-            if slug and slug not in [a['slug'] for a in articles]:
-                # Try to get the title
-                title = link.get_text(strip=True) or "Unknown"
-                articles.append({
-                    'slug': slug,
-                    'url': href,
-                    'title': title[:100],
-                    'content_type': content_type
-                })
+    for href, title in links:
+        slug = extract_slug_from_url(href)
+        if slug and slug not in seen:
+            seen.add(slug)
+            articles.append({
+                'slug': slug,
+                'url': href,
+                'title': (title or "Unknown")[:100],
+                'content_type': content_type
+            })
     
     print(f"  Found {len(articles)} articles")
     return articles
 
-def get_all_pages_for_content_type(base_url, content_type):
-    """Get articles from all pages of a content type (handles pagination)"""
+def parse_listing_page(html, base_url):
+    """Return ([(href, title), ...] article links, highest pagination page linked or None)"""
+    base_path = urlparse(base_url).path
+    links = []
+    last_page = None
+    
+    for href, text in extract_links(html):
+        if '/lab/' in href and ARTICLE_LINK_RE.search(href):
+            links.append((href, text))
+            continue
+        match = PAGE_LINK_RE.search(href)
+        if match and base_path in href:
+            last_page = max(last_page or 0, int(match.group(1)))
+    
+    return links, last_page
+
+def fetch_listing_page(url):
+    """GET a listing page, returning its HTML or None past the last page (404)
+    
+    Transient failures are retried by the shared HTTP client; a page that
+    still fails raises rather than silently ending pagination.
+    """
+    response = get_client().get(url)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.text
+
+def get_all_pages_for_content_type(base_url, content_type, pool=None,
+                                   prefetch=DEFAULT_PREFETCH):
+    """Get articles from all pages of a content type (handles pagination)
+
+    Pages N+1..N+prefetch are fetched speculatively while page N is parsed.
+    Once the pagination links reveal the last page, every remaining page is
+    queued at once. Crawling stops at that last page, a 404 or a page
+    without new articles.
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = ThreadPoolExecutor(max_workers=prefetch + 1)
+    
+    def page_url(n):
+        return base_url if n == 1 else f"{base_url}page/{n}/"
+    
     all_articles = []
+    seen = set()
+    pending = {1: pool.submit(fetch_listing_page, page_url(1))}
     page = 1
+    last_page = None
     
-    while True:
-        if page == 1:
-            url = base_url
-        else:
-            url = f"{base_url}page/{page}/"
-        
-        print(f"  Checking page {page}...")
-        
-        try:
-            response = requests.get(url, timeout=30)
-            if response.status_code == 404:
+    try:
+        while True:
+            horizon = last_page if last_page is not None else page + prefetch
+            for n in range(page + 1, horizon + 1):
+                if n not in pending:
+                    pending[n] = pool.submit(fetch_listing_page, page_url(n))
+            
+            print(f"  [{content_type}] Checking page {page}...")
+            html = pending.pop(page).result()
+            if html is None:
                 break
-            response.raise_for_status()
-        except Exception as e:
-            print(f"  Page {page} not found or error: {e}")
-            break
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        page_articles = []
-        
-        # Find all article links
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if '/lab/' in href and re.search(r'/lab/[^/]+/\d+/?$', href):
+            
+            links, linked_last_page = parse_listing_page(html, base_url)
+            if linked_last_page:
+                last_page = max(last_page or page, linked_last_page)
+            
+            page_articles = []
+            for href, title in links:
                 slug = extract_slug_from_url(href)
-                if slug:
-                    # Check if already in list
-                    existing_slugs = [a['slug'] for a in all_articles]
-                    if slug not in existing_slugs:
-                        title = link.get_text(strip=True) or "Unknown"
-                        if len(title) > 5:  # Filter out short non-title texts
-                            page_articles.append({
-                                'slug': slug,
-                                'url': href,
-                                'title': title[:100],
-                                'content_type': content_type
-                            })
-        
-        if not page_articles:
-            break
+                if not slug or slug in seen:
+                    continue
+                title = title or "Unknown"
+                if len(title) > 5:  # Filter out short non-title texts
+                    seen.add(slug)
+                    page_articles.append({
+                        'slug': slug,
+                        'url': href,
+                        'title': title[:100],
+                        'content_type': content_type
+                    })
             
-        all_articles.extend(page_articles)
-        print(f"  Found {len(page_articles)} articles on page {page}")
-        page += 1
-        
-        if page > 10:  # Safety limit
-            break
+            if not page_articles:
+                break
+            
+            all_articles.extend(page_articles)
+            print(f"  [{content_type}] Found {len(page_articles)} articles on page {page}")
+            
+            if last_page is not None and page >= last_page:
+                break
+            page += 1
+    finally:
+        for future in pending.values():
+            future.cancel()
+        if own_pool:
+            pool.shutdown(wait=False)
     
     return all_articles
 
+def crawl_content_types(journal):
+    """Crawl every content_type_urls() listing and return {slug: article}
+    
+    All content types are crawled at once over a shared pool; pacing and
+    retries come from the shared HTTP client. Each finished content_type crawl
+    is journaled; --resume skips it next time. If a crawl still fails after
+    retries the run stops instead of syncing a truncated listing.
+    """
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    prefetch = get_option('--prefetch', DEFAULT_PREFETCH, int)
+    
+    crawled = journal.fetched['crawl']
+    to_crawl = {ct: url for ct, url in content_type_urls().items() if ct not in crawled}
+    
+    print(f"\n📂 Fetching {', '.join(ct.upper() for ct in to_crawl) or 'no'} articles from WordPress...")
+    with ThreadPoolExecutor(max_workers=concurrency) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=len(CONTENT_TYPES)) as crawl_pool:
+        crawls = {
+            content_type: crawl_pool.submit(
+                get_all_pages_for_content_type, url, content_type, fetch_pool, prefetch
+            )
+            for content_type, url in to_crawl.items()
+        }
+        failed = []
+        for content_type, crawl in crawls.items():
+            try:
+                journal.record_fetched('crawl', content_type, crawl.result())
+            except Exception as e:
+                print(f"  ✗ [{content_type}] Crawl failed: {e}")
+                failed.append(content_type)
+    
+    if failed:
+        print(f"\nError: Could not crawl {', '.join(failed)}; rerun with --resume to retry")
+        journal.close()
+        sys.exit(1)
+    
+    wp_articles = {}
+    for content_type in CONTENT_TYPES:
+        articles = crawled[content_type]
+        for article in articles:
+            wp_articles[article['slug']] = article
+        print(f"   Total {content_type}: {len(articles)} articles")
+    return wp_articles
+
+def is_lab_sitemap(url):
+    """Only the lab sub-sitemaps of the index are read"""
+    return 'lab' in url.rstrip('/').rsplit('/', 1)[-1]
+
+def get_content_type_terms():
+    """{term id: content_type slug} of the content_type taxonomy"""
+    taxonomy = get_option('--content-type-taxonomy', CONTENT_TYPE_TAXONOMY)
+    res = get_client().get(f"{wp_base_url()}/wp-json/wp/v2/{taxonomy}",
+                           params={'per_page': 100, '_fields': 'id,slug'})
+    res.raise_for_status()
+    return {term['id']: term['slug'] for term in res.json()}
+
+def post_content_type(post, terms):
+    """First known content_type among a REST API post's taxonomy terms, or None"""
+    taxonomy = get_option('--content-type-taxonomy', CONTENT_TYPE_TAXONOMY)
+    content_types = [terms.get(t) for t in post.get(taxonomy) or []]
+    return next((ct for ct in content_types if ct in CONTENT_TYPES), None)
+
+def fetch_lab_posts(post_ids, fields):
+    """Yield lab posts (REST API, only `fields`) by ID, WP_API_INCLUDE_BATCH per request"""
+    post_type = get_option('--lab-post-type', WP_LAB_POST_TYPE)
+    
+    def fetch_batch(ids):
+        params = {'include': ','.join(map(str, ids)), 'per_page': len(ids), '_fields': fields}
+        res = get_client().get(f"{wp_base_url()}/wp-json/wp/v2/{post_type}", params=params)
+        res.raise_for_status()
+        return res.json()
+    
+    batches = list(chunked(sorted(post_ids), WP_API_INCLUDE_BATCH))
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    for _, posts in fetch_concurrent(batches, fetch_batch, concurrency, rate=None):
+        yield from posts
+
+def get_lab_content_types(post_ids):
+    """{post id: (content_type, title)} for lab posts, via the REST API"""
+    taxonomy = get_option('--content-type-taxonomy', CONTENT_TYPE_TAXONOMY)
+    terms = get_content_type_terms()
+    found = {}
+    for post in fetch_lab_posts(post_ids, f'id,title,{taxonomy}'):
+        content_type = post_content_type(post, terms)
+        if content_type:
+            found[post['id']] = (content_type, (post.get('title') or {}).get('rendered') or "Unknown")
+    return found
+
+def discover_from_sitemap(journal, since):
+    """Return ({slug: article} changed after `since`, newest lastmod seen)
+    
+    Article URLs and lastmod come from the streamed lab sitemaps; content_type
+    (and title) of just those articles is then looked up by post ID in the
+    REST API, so no theme markup is involved.
+    """
+    if 'sitemap' in journal.fetched['crawl']:
+        saved = journal.fetched['crawl']['sitemap']
+        return {a['slug']: a for a in saved['articles']}, saved['high_water']
+    
+    index_url = sitemap_url()
+    print(f"\n🗺️  Reading {index_url} (changed since: {since or 'any time'})...")
+    changed = {}
+    high_water = normalize_iso_date(since) if since else None
+    for url, lastmod in iter_sitemap(index_url, since, include=is_lab_sitemap):
+        slug = extract_slug_from_url(url)
+        if not slug:
+            continue
+        changed[slug] = {'slug': slug, 'url': url, 'lastmod': lastmod}
+        if lastmod and (high_water is None or datetime.fromisoformat(lastmod) > datetime.fromisoformat(high_water)):
+            high_water = lastmod
+    print(f"   Changed articles in sitemap: {len(changed)}")
+    
+    found = get_lab_content_types({lab_post_id(slug) for slug in changed} - {None})
+    articles = []
+    for slug, article in changed.items():
+        content_type, title = found.get(lab_post_id(slug), (None, None))
+        if content_type:
+            articles.append({**article, 'title': title[:100], 'content_type': content_type})
+    print(f"   With a known content_type: {len(articles)}")
+    
+    journal.record_fetched('crawl', 'sitemap', {'articles': articles, 'high_water': high_water})
+    return {a['slug']: a for a in articles}, high_water
+
+def discover_wp_articles(journal, name):
+    """Return ({slug: article}, high_water) for the chosen --discovery mode
+    
+    Listing mode returns every article and no high-water mark. Sitemap mode
+    returns only articles changed since the last completed run of `name`
+    (--since overrides), plus the mark to save once this run completes.
+    """
+    if get_option('--discovery', 'listing') == 'sitemap':
+        return discover_from_sitemap(journal, get_option('--since') or read_high_water(name))
+    return crawl_content_types(journal), None
+
 def main():
+    supabase = get_supabase()
+
     print("=" * 70)
     print("Sync content_type from WordPress")
     print("=" * 70)
+    enable_report('sync_content_types_from_wp')
     
-    # Collect all articles from WordPress
-    wp_articles = {}
+    if run_apply(supabase, 'sync_content_types_from_wp'):
+        return
     
-    for content_type, url in CONTENT_TYPE_URLS.items():
-        print(f"\n📂 Fetching {content_type.upper()} articles from WordPress...")
-        articles = get_all_pages_for_content_type(url, content_type)
-        for article in articles:
-            wp_articles[article['slug']] = article
-        print(f"   Total {content_type}: {len(articles)} articles")
+    # Collect all articles from WordPress
+    journal = open_journal('sync_content_types_from_wp')
+    with phase('crawl'):
+        wp_articles, high_water = discover_wp_articles(journal, 'sync_content_types_from_wp')
+    incremental = get_option('--discovery', 'listing') == 'sitemap'
     
     print("\n" + "=" * 70)
     print(f"Total articles from WordPress: {len(wp_articles)}")
     print("=" * 70)
     
-    # Get current articles from database
+    # Diff WordPress against the database by slug (compact records, sorted merge)
     print("\n📊 Fetching current articles from database...")
-    db_response = supabase.table('lab_articles').select('id, slug, title, content_type').execute()
-    db_articles = {a['slug']: a for a in db_response.data}
-    print(f"   Total in database: {len(db_articles)}")
-    
-    # Compare and prepare updates
-    updates = []
-    missing_in_db = []
-    not_in_wp = []
-    
-    for slug, wp_article in wp_articles.items():
-        if slug in db_articles:
-            db_article = db_articles[slug]
-            if db_article['content_type'] != wp_article['content_type']:
-                updates.append({
-                    'id': db_article['id'],
-                    'slug': slug,
-                    'old_type': db_article['content_type'],
-                    'new_type': wp_article['content_type'],
-                    'title': db_article['title'][:50]
-                })
-        else:
-            missing_in_db.append(wp_article)
-    
-    for slug, db_article in db_articles.items():
-        if slug not in wp_articles:
-            not_in_wp.append(db_article)
+    db_count = 0
+    def count_db(rows):
+        nonlocal db_count
+        for row in rows:
+            db_count += 1
+            yield row
+    
+    fields = ['content_type']
+    with phase('db_read'):
+        db_records = make_records(
+            count_db(read_rows(supabase, 'lab_articles', 'id, slug, content_type')), 'slug', fields, 'id'
+        )
+    with phase('diff'):
+        plan = diff(
+            make_records(wp_articles.values(), 'slug', fields), db_records,
+            'lab_articles', 'slug', fields,
+            # Sitemap discovery only returns changed articles, so absence means nothing
+            deletes=not incremental,
+        )
+    print(f"   Total in database: {db_count}")
+    
+    updates = plan.changes('content_type')
     
     # Report
     print("\n" + "=" * 70)
@@ -187,26 +378,27 @@ def main():
     print("=" * 70)
     
     print(f"\n🔄 Articles to UPDATE content_type: {len(updates)}")
-    for u in updates[:20]:
-        print(f"   - {u['title'][:40]}... : {u['old_type']} → {u['new_type']}")
+    for key, _, old, new in plan.updates[:20]:
+        print(f"   - {key}: {old[0]} → {new[0]}")
     if len(updates) > 20:
         print(f"   ... and {len(updates) - 20} more")
     
-    print(f"\n❌ Articles in WordPress but NOT in database: {len(missing_in_db)}")
-    for m in missing_in_db[:10]:
-        print(f"   - {m['slug']}: {m['title'][:40]}...")
-    if len(missing_in_db) > 10:
-        print(f"   ... and {len(missing_in_db) - 10} more")
+    print(f"\n❌ Articles in WordPress but NOT in database: {len(plan.adds)}")
+    for record in plan.adds[:10]:
+        print(f"   - {record.key}: {wp_articles[record.key]['title'][:40]}...")
+    if len(plan.adds) > 10:
+        print(f"   ... and {len(plan.adds) - 10} more")
     
-    print(f"\n⚠️  Articles in database but NOT in WordPress content_type pages: {len(not_in_wp)}")
-    for n in not_in_wp[:10]:
-        print(f"   - {n['slug']}: {n['title'][:40] if n['title'] else 'No title'}...")
-    if len(not_in_wp) > 10:
-        print(f"   ... and {len(not_in_wp) - 10} more")
+    if not incremental:
+        print(f"\n⚠️  Articles in database but NOT in WordPress content_type pages: {len(plan.deletes)}")
+        for record in plan.deletes[:10]:
+            print(f"   - {record.key}")
+        if len(plan.deletes) > 10:
+            print(f"   ... and {len(plan.deletes) - 10} more")
     
     # Summary by content_type
     print("\n" + "=" * 70)
-    print("WordPress content_type distribution:")
+    print("WordPress content_type distribution" + (" (changed articles only):" if incremental else ":"))
     print("=" * 70)
     type_counts = {}
     for article in wp_articles.values():
@@ -215,27 +407,49 @@ def main():
     for ct, count in sorted(type_counts.items()):
         print(f"   - {ct}: {count} articles")
     
+    plan_path = get_option('--plan')
+    if plan_path:
+        write_plan_file(plan_path, 'sync_content_types_from_wp', [plan], high_water)
+        print(f"\n📋 Plan written to {plan_path}; apply it with --apply {plan_path}")
+        journal.finish()
+        return
+    
     # Apply updates
     if updates and ('--yes' in sys.argv or input("\nApply updates? (y/n): ").strip().lower() == 'y'):
         print("\n🔄 Applying updates...")
-        for u in updates:
-            supabase.table('lab_articles').update({
-                'content_type': u['new_type']
-            }).eq('id', u['id']).execute()
-        print(f"   ✓ Updated {len(updates)} articles")
+        # Distribution as read, kept current from the rows the writes return
+        final_counts = count_values(record.values[0] for record in db_records)
+        old_types = {article_id: old for article_id, _, old in updates}
+        def on_batch(value, ids):
+            journal.record_applied('lab_articles', ids)
+            record_write('lab_articles', 'id', 'content_type', value, ids)
+            adjust_counts(final_counts, old_types, value, ids)
         
-        # Verify
-        response = supabase.table('lab_articles').select('content_type').execute()
-        final_counts = {}
-        for a in response.data:
-            ct = a.get('content_type') or 'NULL'
-            final_counts[ct] = final_counts.get(ct, 0) + 1
+        with phase('write'):
+            written = bulk_update(supabase, 'lab_articles', 'content_type', updates,
+                                  on_batch=on_batch, **get_write_options())
+        print(f"   ✓ Updated {written} articles")
         
         print("\n📊 Final database distribution:")
         for ct, count in sorted(final_counts.items()):
             print(f"   - {ct}: {count} articles")
+        
+        if written < len(updates):
+            # Advancing the mark would hide these articles from later sitemap runs
+            print(f"\n⚠️  {len(updates) - written} updates did not take effect (listed above)")
+            print("   High-water mark not advanced; rerun with --resume to retry them")
+            journal.close()
+            return
     else:
         print("\nNo updates applied.")
+        if updates:
+            print("   (Crawl results are kept; rerun with --resume to reuse them)")
+            journal.close()
+            return
+    
+    if high_water:
+        write_high_water('sync_content_types_from_wp', high_water)
+    journal.finish()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Incremental sync daemon for lab_articles (content_type, published_at) and
+posts (published_at)
+
+Instead of re-crawling every listing page, each poll asks WordPress only for
+what changed since the last poll, reads just those rows from the database
+and writes the differences:
+
+  --signal rest      REST API modified_after on the lab post type (default).
+                     One request per 100 changed posts returns date, link and
+                     content_type terms, so no article page is fetched.
+  --signal sitemap   lab sitemap lastmod; the changed posts are then looked up
+                     by ID with include= requests.
+
+News/Seminar posts are always polled with modified_after. Each source keeps
+its own high-water mark (.journal/sync_daemon_<source>.high_water): the newest
+modified time seen, saved only after that source's changes are written. With
+no mark yet, the first poll starts at --since or, without it, sweeps the REST
+API once.
+
+As in sync_published_dates.py, published_at is only filled in where it is
+missing, never overwritten.
+
+Usage:
+  python sync_daemon.py [--interval 300] [--signal rest|sitemap] [--once]
+                        [--dry-run] [--rate 1] [--metrics sync.prom]
+
+Requests to WordPress are capped at --rate per second (default 1) and, unlike
+the one-off scripts, the rate never ramps above it unless --max-rate is
+given. With --metrics the report is rewritten after every poll; its latency
+quantiles cover that poll only.
+"""
+
+import sys
+import time
+from datetime import datetime
+
+from bulk_write import bulk_update, get_write_options
+from clients import get_supabase
+from common import get_option
+from db_reader import iter_rows_by_keys
+from diff_engine import diff, make_records
+from http_cache import get_cache
+from http_client import configure_client
+from journal import read_high_water, write_high_water
+from metrics import metrics, phase, write_report
+from mirror import record_write
+from published_date import normalize_iso_date
+from sitemap import iter_sitemap
+from sync_content_types_from_wp import (
+    CONTENT_TYPE_TAXONOMY, extract_slug_from_url, fetch_lab_posts,
+    get_content_type_terms, is_lab_sitemap, post_content_type, sitemap_url,
+)
+from sync_published_dates import WP_LAB_POST_TYPE, lab_post_id, sweep_wp_api
+
+DEFAULT_INTERVAL = 300
+# Requests per second to WordPress; the daemon is a background job
+DEFAULT_DAEMON_RATE = 1.0
+SIGNALS = ('rest', 'sitemap')
+
+LAB_FIELDS = ['content_type', 'published_at']
+POSTS_FIELDS = ['published_at']
+
+
+def cap_request_rate():
+    """Configure the shared HTTP client: --rate defaults to DEFAULT_DAEMON_RATE
+    and --max-rate to --rate. Returns the rate.
+
+    Must run before the shared HTTP client is first used.
+    """
+    rate = get_option('--rate', DEFAULT_DAEMON_RATE, float)
+    configure_client(rate, max_rate=get_option('--max-rate', rate, float))
+    return rate
+
+
+def newer(a, b):
+    """The later of two ISO timestamps (either may be None); naive values are JST"""
+    a, b = normalize_iso_date(a or ''), normalize_iso_date(b or '')
+    if a is None or b is None:
+        return a or b
+    return a if datetime.fromisoformat(a) >= datetime.fromisoformat(b) else b
+
+
+def start_mark(mark):
+    """Where a source's poll starts: its saved mark, else --since (with offset)"""
+    return read_high_water(mark) or normalize_iso_date(get_option('--since') or '')
+
+
+def changed_lab_posts(since, signal):
+    """(lab posts changed after `since`, newest modified time seen)"""
+    taxonomy = get_option('--content-type-taxonomy', CONTENT_TYPE_TAXONOMY)
+    fields = f'id,date,modified,link,{taxonomy}'
+    high_water = since
+
+    if signal == 'sitemap':
+        post_ids = set()
+        for url, lastmod in iter_sitemap(sitemap_url(), since, include=is_lab_sitemap):
+            slug = extract_slug_from_url(url)
+            if slug and lab_post_id(slug):
+                post_ids.add(lab_post_id(slug))
+                high_water = newer(high_water, lastmod)
+        return list(fetch_lab_posts(post_ids, fields)), high_water
+
+    post_type = get_option('--lab-post-type', WP_LAB_POST_TYPE)
+    posts = list(sweep_wp_api(post_type, fields, since, strict=True))
+    for post in posts:
+        high_water = newer(high_water, normalize_iso_date(post.get('modified') or ''))
+    return posts, high_water
+
+
+def changed_posts(since):
+    """(News/Seminar posts changed after `since`, newest modified time seen)"""
+    posts = list(sweep_wp_api('posts', 'slug,date,modified', since, strict=True))
+    high_water = since
+    for post in posts:
+        high_water = newer(high_water, normalize_iso_date(post.get('modified') or ''))
+    return posts, high_water
+
+
+def sync_rows(supabase, table, wp_rows, fields, dry_run):
+    """Diff wp_rows against the same slugs in `table` and write the changes
+
+    Returns {field: rows changed (confirmed by the write responses)}, with
+    the writes that did not take effect under 'missed'. Rows missing from the
+    database are only counted (under 'missing'). Rows are written by slug, as
+    in sync_published_dates.py.
+    """
+    slugs = [row['slug'] for row in wp_rows]
+    db_rows = list(iter_rows_by_keys(supabase, table, ', '.join(['slug', *fields]), 'slug', slugs))
+
+    # published_at is only filled in; an existing value is left alone
+    dated = {row['slug'] for row in db_rows if row.get('published_at')}
+    source = ({**row, 'published_at': None if row['slug'] in dated else row['published_at']} for row in wp_rows)
+    plan = diff(make_records(source, 'slug', fields), make_records(db_rows, 'slug', fields),
+                table, 'slug', fields, deletes=False, ignore_none=True)
+
+    counts = {'missing': len(plan.adds), 'missed': 0}
+    options = get_write_options()
+    for field in fields:
+        changes = plan.changes(field, by='key')
+        counts[field] = len(changes)
+        if changes and not dry_run:
+            counts[field] = bulk_update(
+                supabase, table, field, changes, key='slug',
+                on_batch=lambda value, slugs, field=field: record_write(table, 'slug', field, value, slugs),
+                **options,
+            )
+            counts['missed'] += len(changes) - counts[field]
+    return counts
+
+
+def advance_high_water(mark, high_water, counts, dry_run):
+    """Save a source's new mark unless some of its writes didn't take effect
+
+    The mark stays put in that case, so the next poll sees the same changes
+    and retries them.
+    """
+    if not high_water or dry_run:
+        return
+    if counts['missed']:
+        metrics.count('daemon_marks_held')
+        print(f"   ⚠️  {counts['missed']} write(s) did not take effect; {mark} stays at "
+              f"{read_high_water(mark) or 'none'}", flush=True)
+        return
+    write_high_water(mark, high_water)
+
+
+def poll(supabase, signal, terms, dry_run):
+    """One incremental pass over lab posts and News/Seminar posts"""
+    started = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    # Lab articles
+    lab_mark = 'sync_daemon_lab'
+    since = start_mark(lab_mark)
+    with phase('poll'):
+        posts, lab_high_water = changed_lab_posts(since, signal)
+        # A term added in WordPress since the last poll
+        taxonomy = get_option('--content-type-taxonomy', CONTENT_TYPE_TAXONOMY)
+        if any(t not in terms for post in posts for t in post.get(taxonomy) or []):
+            terms.update(get_content_type_terms())
+    lab_rows = []
+    for post in posts:
+        slug = extract_slug_from_url(post.get('link') or '')
+        if slug:
+            lab_rows.append({
+                'slug': slug,
+                'content_type': post_content_type(post, terms),
+                'published_at': normalize_iso_date(post.get('date') or ''),  # WordPress date is site time (JST)
+            })
+    with phase('write'):
+        lab_counts = sync_rows(supabase, 'lab_articles', lab_rows, LAB_FIELDS, dry_run)
+    advance_high_water(lab_mark, lab_high_water, lab_counts, dry_run)
+
+    # News/Seminar posts
+    posts_mark = 'sync_daemon_posts'
+    since = start_mark(posts_mark)
+    with phase('poll'):
+        posts, posts_high_water = changed_posts(since)
+    posts_rows = [
+        {'slug': post['slug'], 'published_at': normalize_iso_date(post.get('date') or '')}
+        for post in posts if post.get('slug')
+    ]
+    with phase('write'):
+        posts_counts = sync_rows(supabase, 'posts', posts_rows, POSTS_FIELDS, dry_run)
+    advance_high_water(posts_mark, posts_high_water, posts_counts, dry_run)
+
+    metrics.count('daemon_polls')
+    metrics.count('daemon_changed_posts', len(lab_rows) + len(posts_rows))
+    suffix = ' (dry run)' if dry_run else ''
+    print(f"[{started}] lab: {len(lab_rows)} changed → content_type {lab_counts['content_type']}, "
+          f"published_at {lab_counts['published_at']}, not in database {lab_counts['missing']} | "
+          f"posts: {len(posts_rows)} changed → published_at {posts_counts['published_at']}{suffix}", flush=True)
+
+
+def main():
+    signal = get_option('--signal', 'rest')
+    if signal not in SIGNALS:
+        print(f"Error: --signal must be one of {', '.join(SIGNALS)}")
+        sys.exit(1)
+    if get_option('--since') and not normalize_iso_date(get_option('--since')):
+        print(f"Error: --since must be an ISO 8601 date or timestamp, got {get_option('--since')!r}")
+        sys.exit(1)
+    interval = get_option('--interval', DEFAULT_INTERVAL, float)
+    once = '--once' in sys.argv
+    dry_run = '--dry-run' in sys.argv
+    metrics_path = get_option('--metrics')
+    rate = cap_request_rate()
+    supabase = get_supabase()
+
+    print("=" * 70)
+    print("Incremental sync daemon (lab_articles + posts)")
+    print("=" * 70)
+    print(f"  Signal: {signal} / interval: {interval:g}s / rate: {rate:g} req/s"
+          f"{' / dry run' if dry_run else ''}")
+    print(f"  Lab high-water mark: {start_mark('sync_daemon_lab') or 'none (first poll sweeps everything)'}")
+
+    terms = get_content_type_terms()
+    failures = 0
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                poll(supabase, signal, terms, dry_run)
+                failures = 0
+            except Exception as e:
+                # Marks are only advanced after a successful write, so the
+                # next poll picks the same changes up again
+                failures += 1
+                metrics.count('daemon_poll_errors')
+                print(f"❌ Poll failed ({failures} in a row): {e}", flush=True)
+            if metrics_path:
+                write_report(metrics_path, 'sync_daemon')
+            # Quantiles then describe one poll, and the samples don't pile up
+            metrics.clear_samples()
+            # Enforce --http-cache-max-mb / --http-cache-max-age between polls
+            cache = get_cache()
+            if cache:
+                cache.evict()
+            if once:
+                sys.exit(1 if failures else 0)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+
+if __name__ == '__main__':
+    main()
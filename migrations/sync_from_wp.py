@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Sync content_type and published_at of lab_articles from WordPress in one pass
+
+Fused version of sync_content_types_from_wp.py + the lab half of
+sync_published_dates.py: the content_type listing pages are crawled once,
+lab_articles is read once, publish dates come from one REST API sweep of the
+lab post type (article pages are only fetched for index misses), and a single
+diff is applied in one write phase.
+
+News/Seminar posts are still handled by sync_published_dates.py.
+
+Usage:
+  python sync_from_wp.py [--yes] [--resume] [--discovery sitemap]
+  python sync_from_wp.py --plan plan.json     # compute changes only
+  python sync_from_wp.py --apply plan.json    # apply a saved plan
+"""
+
+import sys
+
+from bulk_write import bulk_update, get_write_options
+from clients import get_supabase
+from common import get_option
+from diff_engine import diff, make_records
+from fetch_engine import fetch_concurrent, DEFAULT_CONCURRENCY
+from journal import open_journal, write_high_water
+from metrics import enable_report, mark
+from mirror import read_rows, record_write
+from plans import run_apply, write_plan_file
+from reports import adjust_counts, count_values
+from sync_content_types_from_wp import discover_wp_articles
+from sync_published_dates import get_lab_article_date, get_wp_api_lab_dates, lab_post_id
+
+
+
+def resolve_published_dates(slugs, journal):
+    """{slug: published_at} for lab articles without a date
+
+    Dates come from the REST API index by post ID; only misses fetch the
+    article page. Every resolved date is journaled.
+    """
+    dates = {s: d for s, d in journal.fetched['published_at'].items() if s in slugs}
+    pending = [s for s in slugs if s not in dates]
+    if not pending:
+        return dates
+
+    lab_index = get_wp_api_lab_dates()
+    misses = []
+    for slug in pending:
+        date = lab_index.get(lab_post_id(slug))
+        if date:
+            journal.record_fetched('published_at', slug, date)
+            dates[slug] = date
+        else:
+            misses.append(slug)
+    print(f"   REST API index: {len(pending) - len(misses)} resolved, {len(misses)} to fetch")
+
+    # Pacing and retries are handled by the shared HTTP client
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    for i, (slug, date) in enumerate(fetch_concurrent(misses, get_lab_article_date, concurrency, rate=None)):
+        if date:
+            journal.record_fetched('published_at', slug, date)
+            dates[slug] = date
+            print(f"   [{i+1}/{len(misses)}] {slug}... ✓ {date[:10]}", flush=True)
+        else:
+            print(f"   [{i+1}/{len(misses)}] {slug}... ✗ not found", flush=True)
+    return dates
+
+
+def main():
+    supabase = get_supabase()
+
+    print("=" * 70)
+    print("Sync content_type + published_at from WordPress")
+    print("=" * 70)
+    enable_report('sync_from_wp')
+
+    if run_apply(supabase, 'sync_from_wp'):
+        return
+
+    journal = open_journal('sync_from_wp')
+
+    # 1. One crawl of the content_type listing pages (or, with --discovery
+    #    sitemap, only the articles changed since the last completed run)
+    mark('crawl')
+    wp_articles, high_water = discover_wp_articles(journal, 'sync_from_wp')
+    print(f"\n   Total articles from WordPress: {len(wp_articles)}")
+
+    # 2. One read of lab_articles, kept as compact sorted records
+    print("\n📊 Fetching current articles from database...")
+    mark('db_read')
+    fields = ['content_type', 'published_at']
+    db_records = make_records(
+        read_rows(supabase, 'lab_articles', 'id, slug, content_type, published_at'), 'slug', fields, 'id'
+    )
+    print(f"   Total in database: {len(db_records)}")
+
+    # 3. Publish dates for every undated article
+    print("\n📅 Resolving missing publish dates...")
+    mark('date_fetch')
+    undated = [r.key for r in db_records if not r.values[1]]
+    print(f"   Without published_at: {len(undated)}")
+    dates = resolve_published_dates(undated, journal)
+
+    # 4. One diff; a None on the WordPress side leaves that field as it is
+    mark('diff')
+    wp_rows = (
+        {'slug': slug,
+         'content_type': wp_articles.get(slug, {}).get('content_type'),
+         'published_at': dates.get(slug)}
+        for slug in wp_articles.keys() | dates.keys()
+    )
+    plan = diff(make_records(wp_rows, 'slug', fields), db_records, 'lab_articles', 'slug', fields,
+                deletes=False, ignore_none=True)
+    type_changes = plan.changes('content_type')
+    date_changes = plan.changes('published_at')
+    missing_in_db = plan.adds
+    mark(None)
+
+    print("\n" + "=" * 70)
+    print("Analysis Results")
+    print("=" * 70)
+    print(f"\n🔄 content_type updates: {len(type_changes)}")
+    for article_id, new_type, old_type in type_changes[:20]:
+        print(f"   - {article_id}: {old_type} → {new_type}")
+    if len(type_changes) > 20:
+        print(f"   ... and {len(type_changes) - 20} more")
+    print(f"📅 published_at updates: {len(date_changes)} (unresolved: {len(undated) - len(date_changes)})")
+    print(f"❌ In WordPress but NOT in database: {len(missing_in_db)}")
+
+    plan_path = get_option('--plan')
+    if plan_path:
+        write_plan_file(plan_path, 'sync_from_wp', [plan], high_water)
+        print(f"\n📋 Plan written to {plan_path}; apply it with --apply {plan_path}")
+        journal.finish()
+        return
+
+    if not type_changes and not date_changes:
+        print("\nNothing to update.")
+        if high_water:
+            write_high_water('sync_from_wp', high_water)
+        journal.finish()
+        return
+
+    if '--yes' not in sys.argv and input("\nApply updates? (y/n): ").strip().lower() != 'y':
+        print("\nNo updates applied. (Fetched results are kept; rerun with --resume to reuse them)")
+        journal.close()
+        return
+
+    # 5. One write phase
+    print("\n🔄 Applying updates...")
+    mark('write')
+    options = get_write_options()
+    # content_type distribution as read, kept current from the rows the writes return
+    type_counts = count_values(record.values[0] for record in db_records)
+    old_types = {article_id: old for article_id, _, old in type_changes}
+    missed = 0
+    for field, changes in (('content_type', type_changes), ('published_at', date_changes)):
+        if not changes:
+            continue
+
+        def on_batch(value, ids, field=field):
+            journal.record_applied(field, ids)
+            record_write('lab_articles', 'id', field, value, ids)
+            if field == 'content_type':
+                adjust_counts(type_counts, old_types, value, ids)
+
+        written = bulk_update(supabase, 'lab_articles', field, changes, on_batch=on_batch, **options)
+        missed += len(changes) - written
+        print(f"   ✓ {field}: {written} articles"
+              f"{f' ({len(changes) - written} did not take effect)' if written < len(changes) else ''}")
+
+    mark(None)
+    print("\n📊 Final database distribution:")
+    for ct, count in sorted(type_counts.items()):
+        print(f"   - {ct}: {count} articles")
+
+    if missed:
+        # Advancing the mark would hide these articles from later incremental runs
+        print(f"\n⚠️  {missed} updates did not take effect (listed above)")
+        print("   High-water mark not advanced; rerun with --resume to retry them")
+        journal.close()
+        return
+
+    if high_water:
+        write_high_water('sync_from_wp', high_water)
+    journal.finish()
+
+
+if __name__ == '__main__':
+    main()
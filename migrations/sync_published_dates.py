@@ -1,30 +1,38 @@
 #!/usr/bin/env python3
 """
 WordPressから公開日を取得してデータベースを更新するスクリプト
+
+  --plan PATH    取得・差分計算のみ行い、変更内容をPATHに書き出して終了
+  --apply PATH   取得を行わず、保存済みの変更内容を適用（plans.py 参照）
 """
 
-import os
 import sys
 import re
-import time
-import pathlib
 from datetime import datetime
-from typing import Optional, Dict
-import requests
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
+from typing import Optional, Dict, Iterator, List, Tuple
+
+from bulk_write import bulk_update, get_write_options
+from clients import get_supabase
+from common import get_option
+from diff_engine import diff, make_records
+from fetch_engine import fetch_concurrent, DEFAULT_CONCURRENCY
+from html_backend import iter_texts
+from http_client import get_client
+from journal import open_journal
+from metrics import enable_report, mark, metrics
+from mirror import read_rows, record_write
+from plans import run_apply, write_plan_file
+from published_date import read_published_date, normalize_iso_date
+
+DEFAULT_WP_BASE_URL = 'https://partner-prop.com'
 
-# .envファイルを読み込み
-env_path = pathlib.Path('.env.local')
-if not env_path.exists():
-    env_path = pathlib.Path('.env')
-load_dotenv(env_path)
 
-from supabase import create_client
+def wp_base_url() -> str:
+    """WordPress サイトのURL（--wp-base-url でステージングや bench_sync.py のスタブを指せる）
 
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-WP_BASE_URL = 'https://partner-prop.com'
+    import 時ではなく呼び出し時に sys.argv を読む
+    """
+    return get_option('--wp-base-url', DEFAULT_WP_BASE_URL).rstrip('/')
 
 
 def parse_japanese_date(date_str: str) -> Optional[str]:
@@ -51,23 +59,26 @@ def get_lab_article_date(slug: str) -> Optional[str]:
     if last_underscore != -1:
         category = slug[:last_underscore]
         id_part = slug[last_underscore + 1:]
-        url = f"{WP_BASE_URL}/lab/{category}/{id_part}/"
+        url = f"{wp_base_url()}/lab/{category}/{id_part}/"
     else:
-        url = f"{WP_BASE_URL}/lab/{slug}/"
+        url = f"{wp_base_url()}/lab/{slug}/"
     
     try:
-        res = requests.get(url, timeout=15)
-        if res.status_code != 200:
-            return None
-        
-        soup = BeautifulSoup(res.text, 'html.parser')
+        # 構造化データ（JSON-LD / meta / time）が見つかった時点で読み込みを打ち切る
+        with get_client().get(url, timeout=15, stream=True) as res:
+            if res.status_code != 200:
+                return None
+            date, html = read_published_date(res)
+        if date:
+            return date
         
-        # 日付テキストを探す
-        date_patterns = soup.find_all(string=lambda text: text and ('年' in str(text) and '月' in str(text) and '日' in str(text)))
-        for pattern in date_patterns:
-            date = parse_japanese_date(str(pattern))
-            if date:
-                return date
+        # 構造化データがない場合は日付テキストを探す（パーサーは html_backend で選択）
+        with metrics.timed('html_parse'):
+            for text in iter_texts(html):
+                if '年' in text and '月' in text and '日' in text:
+                    date = parse_japanese_date(text)
+                    if date:
+                        return date
         
         return None
     except Exception as e:
@@ -75,71 +86,151 @@ def get_lab_article_date(slug: str) -> Optional[str]:
         return None
 
 
-def get_wp_api_posts() -> Dict[str, str]:
-    """WordPress REST APIから投稿の公開日を取得"""
-    dates = {}
-    page = 1
-    per_page = 100
-    
-    while True:
-        try:
-            url = f"{WP_BASE_URL}/wp-json/wp/v2/posts?per_page={per_page}&page={page}"
-            res = requests.get(url, timeout=15)
-            
-            if res.status_code != 200:
-                break
-            
-            posts = res.json()
-            if not posts:
-                break
-            
-            for post in posts:
-                slug = post.get('slug')
-                date = post.get('date')
-                if slug and date:
-                    # ISO形式に変換
-                    dates[slug] = date
-            
-            page += 1
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"  API エラー: {e}")
-            break
+WP_API_PER_PAGE = 100
+WP_API_FIELDS = 'slug,date,modified'
+WP_API_LAB_FIELDS = 'id,date,modified'
+# Lab記事のカスタム投稿タイプ（REST APIのエンドポイント名）
+WP_LAB_POST_TYPE = 'lab'
+
+
+def fetch_wp_api_page(post_type: str, page: int, fields: str,
+                      modified_after: Optional[str] = None) -> Tuple[Optional[List[dict]], int]:
+    """REST APIの1ページ分を取得し、(投稿リスト, 総ページ数) を返す（失敗時は None）"""
+    params = {'per_page': WP_API_PER_PAGE, 'page': page, '_fields': fields}
+    if modified_after:
+        params['modified_after'] = modified_after
+    try:
+        res = get_client().get(f"{wp_base_url()}/wp-json/wp/v2/{post_type}", params=params, timeout=15)
+        if res.status_code != 200:
+            return None, 0
+        return res.json(), int(res.headers.get('X-WP-TotalPages', 1))
+    except Exception as e:
+        print(f"  API エラー ({post_type} page {page}): {e}")
+        return None, 0
+
+
+def sweep_wp_api(post_type: str, fields: str, modified_after: Optional[str] = None,
+                 strict: bool = False) -> Iterator[dict]:
+    """REST APIの全ページを走査して投稿を返す
     
+    1ページ目の X-WP-TotalPages で総ページ数を把握し、残りのページを並列取得する。
+    _fields で必要なフィールドのみに絞り、modified_after で差分取得できる。
+    strict=True の場合、取得に失敗したページがあれば読み飛ばさずに例外を送出する。
+    """
+    posts, total_pages = fetch_wp_api_page(post_type, 1, fields, modified_after)
+    if posts is None and strict:
+        raise RuntimeError(f"{post_type} ページ 1 の取得に失敗しました")
+    if not posts:
+        return
+    yield from posts
+    
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    fetch_page = lambda page: fetch_wp_api_page(post_type, page, fields, modified_after)[0]
+    # レート制御・リトライは共有HTTPクライアント側で行う
+    for page, posts in fetch_concurrent(range(2, total_pages + 1), fetch_page, concurrency, rate=None):
+        if posts is None:
+            if strict:
+                raise RuntimeError(f"{post_type} ページ {page} の取得に失敗しました")
+            print(f"  ページ {page} の取得に失敗しました")
+            continue
+        yield from posts
+
+
+def get_wp_api_posts(modified_after: Optional[str] = None) -> Dict[str, str]:
+    """WordPress REST APIから投稿の公開日を取得（slug → date）"""
+    dates = {}
+    for post in sweep_wp_api('posts', WP_API_FIELDS, modified_after):
+        slug = post.get('slug')
+        date = normalize_iso_date(post.get('date') or '')  # WordPressの date はサイト時刻（JST）
+        if slug and date:
+            dates[slug] = date
+    return dates
+
+
+def get_wp_api_lab_dates(modified_after: Optional[str] = None) -> Dict[int, str]:
+    """Lab投稿タイプをREST APIで一括取得し、WordPressの投稿ID → 公開日 の索引を作る"""
+    post_type = get_option('--lab-post-type', WP_LAB_POST_TYPE)
+    dates = {}
+    for post in sweep_wp_api(post_type, WP_API_LAB_FIELDS, modified_after):
+        date = normalize_iso_date(post.get('date') or '')  # WordPressの date はサイト時刻（JST）
+        if post.get('id') and date:
+            dates[int(post['id'])] = date
     return dates
 
 
+def lab_post_id(slug: str) -> Optional[int]:
+    """Lab記事のslugからWordPressの投稿IDを取り出す (例: optimization_950 -> 950)"""
+    _, _, id_part = slug.rpartition('_')
+    return int(id_part) if id_part.isdigit() else None
+
+
 def main():
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Error: SUPABASE_URL or SUPABASE_KEY not found")
-        sys.exit(1)
-    
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = get_supabase()
     
     print("=" * 70)
     print("📅 公開日同期スクリプト")
     print("=" * 70)
+    enable_report('sync_published_dates')
+    
+    if run_apply(supabase, 'sync_published_dates'):
+        return
+    
+    # 取得結果・更新結果をジャーナルに記録（中断後は --resume で再開）
+    journal = open_journal('sync_published_dates')
     
     # 1. Lab記事の公開日を更新
     print("\n【1. Lab記事の公開日を更新】")
-    lab_articles = supabase.table('lab_articles').select('slug, title, published_at').execute()
-    lab_no_date = [a for a in lab_articles.data if not a.get('published_at')]
-    print(f"  公開日未設定: {len(lab_no_date)}件")
-    
-    lab_updates = []
-    for i, article in enumerate(lab_no_date):
-        slug = article['slug']
-        print(f"  [{i+1}/{len(lab_no_date)}] {slug}...", end=" ", flush=True)
-        
-        date = get_lab_article_date(slug)
+    # 公開日未設定の記事だけをDB側で絞り込み、ページ単位でストリーミング取得
+    # （--mirror 指定時はローカルミラーから読み込む）
+    no_date = lambda q: q.is_('published_at', 'null')
+    has_no_date = lambda row: not row.get('published_at')
+    mark('db_read')
+    lab_no_date = make_records(
+        read_rows(supabase, 'lab_articles', 'slug, published_at', where=no_date, predicate=has_no_date),
+        'slug', ['published_at'],
+    )
+    slugs = [record.key for record in lab_no_date]
+    print(f"  公開日未設定: {len(slugs)}件")
+    
+    # 並列取得（--concurrency で同時接続数、--rate で初期レート、--max-rate でレート上限を指定）
+    # レートは応答に応じて自動調整され、429/5xx/タイムアウトはバックオフして再試行する
+    concurrency = get_option('--concurrency', DEFAULT_CONCURRENCY, int)
+    limiter = get_client().limiter
+    print(f"  並列数: {concurrency} / レート: {limiter.rate:g}〜{limiter.max_rate:g} req/s（自動調整）")
+    
+    # 前回までに取得済みの記事はジャーナルから復元
+    lab_updates = [
+        {'slug': slug, 'published_at': date}
+        for slug, date in journal.fetched['lab_articles'].items()
+        if slug not in journal.applied['lab_articles']
+    ]
+    if lab_updates:
+        print(f"  ジャーナルから復元: {len(lab_updates)}件")
+    slugs = [slug for slug in slugs if not journal.is_done('lab_articles', slug)]
+    
+    # まずREST APIの一括取得で作った投稿ID索引から解決し、見つからない記事だけページを取得
+    mark('lab_fetch')
+    if slugs:
+        lab_index = get_wp_api_lab_dates()
+        print(f"  REST APIの索引: {len(lab_index)}件")
+        misses = []
+        for slug in slugs:
+            date = lab_index.get(lab_post_id(slug))
+            if date:
+                journal.record_fetched('lab_articles', slug, date)
+                lab_updates.append({'slug': slug, 'published_at': date})
+            else:
+                misses.append(slug)
+        print(f"  索引で解決: {len(slugs) - len(misses)}件 / ページ取得へ: {len(misses)}件")
+        slugs = misses
+    
+    for i, (slug, date) in enumerate(fetch_concurrent(slugs, get_lab_article_date, concurrency, rate=None)):
         if date:
+            journal.record_fetched('lab_articles', slug, date)
             lab_updates.append({'slug': slug, 'published_at': date})
-            print(f"✓ {date[:10]}")
+            print(f"  [{i+1}/{len(slugs)}] {slug}... ✓ {date[:10]}", flush=True)
         else:
-            print("✗ 取得失敗")
-        
-        time.sleep(0.3)  # レート制限
+            print(f"  [{i+1}/{len(slugs)}] {slug}... ✗ 取得失敗", flush=True)
         
         # 10件ごとに進捗表示
         if (i + 1) % 10 == 0:
@@ -149,50 +240,84 @@ def main():
     
     # 2. News/Seminarの公開日を更新（REST API使用）
     print("\n【2. News/Seminarの公開日を更新（REST API）】")
-    wp_dates = get_wp_api_posts()
+    # --modified-after 2024-01-01T00:00:00 で前回以降に更新された投稿だけを取得
+    mark('posts_fetch')
+    wp_dates = get_wp_api_posts(get_option('--modified-after'))
     print(f"  WordPress APIから取得: {len(wp_dates)}件")
     
-    posts = supabase.table('posts').select('slug, title, type, published_at').execute()
-    posts_no_date = [p for p in posts.data if not p.get('published_at')]
+    mark('db_read')
+    posts_no_date = make_records(
+        read_rows(supabase, 'posts', 'slug, published_at', where=no_date, predicate=has_no_date),
+        'slug', ['published_at'],
+    )
     
-    post_updates = []
-    for post in posts_no_date:
-        slug = post['slug']
-        if slug in wp_dates:
-            post_updates.append({'slug': slug, 'published_at': wp_dates[slug]})
+    # 取得結果とDB（公開日未設定の行のみ）をslug順にマージして差分を取る
+    # 片側にしかない行は意味を持たないので add / delete は出さない
+    mark('diff')
+    lab_plan = diff(
+        make_records(lab_updates, 'slug', ['published_at']), lab_no_date,
+        'lab_articles', 'slug', ['published_at'], adds=False, deletes=False,
+    )
+    posts_plan = diff(
+        make_records(({'slug': slug, 'published_at': date} for slug, date in wp_dates.items()), 'slug', ['published_at']),
+        posts_no_date,
+        'posts', 'slug', ['published_at'], adds=False, deletes=False,
+    )
+    lab_changes = lab_plan.changes('published_at', by='key')
+    post_changes = [c for c in posts_plan.changes('published_at', by='key') if c[0] not in journal.applied['posts']]
     
-    print(f"  マッチ: {len(post_updates)}件")
+    print(f"  マッチ: {len(post_changes)}件")
+    mark(None)
     
     # 更新を適用
     print("\n" + "=" * 70)
     print(f"📝 更新対象")
-    print(f"  Lab記事: {len(lab_updates)}件")
-    print(f"  Posts: {len(post_updates)}件")
+    print(f"  Lab記事: {len(lab_changes)}件")
+    print(f"  Posts: {len(post_changes)}件")
     print("=" * 70)
     
+    plan_path = get_option('--plan')
+    if plan_path:
+        write_plan_file(plan_path, 'sync_published_dates', [lab_plan, posts_plan])
+        print(f"\n📋 変更内容を {plan_path} に書き出しました（--apply {plan_path} で適用）")
+        journal.finish()
+        return
+    
     if '--yes' not in sys.argv:
         confirm = input("\n更新を適用しますか？ (y/n): ").strip().lower()
         if confirm != 'y':
-            print("キャンセルしました")
+            print("キャンセルしました（取得結果は --resume で再利用できます）")
+            journal.close()
             return
     
+    # 同じ公開日の記事はまとめて更新（in_() フィルタ + チャンク分割）
+    mark('write')
+    write_options = get_write_options()
+    
     # Lab記事を更新
-    if lab_updates:
+    if lab_changes:
         print("\nLab記事を更新中...")
-        for update in lab_updates:
-            supabase.table('lab_articles').update({
-                'published_at': update['published_at']
-            }).eq('slug', update['slug']).execute()
-        print(f"  ✓ {len(lab_updates)}件更新完了")
+        def on_lab_batch(value, keys):
+            journal.record_applied('lab_articles', keys)
+            record_write('lab_articles', 'slug', 'published_at', value, keys)
+        
+        written = bulk_update(supabase, 'lab_articles', 'published_at', lab_changes, key='slug',
+                              on_batch=on_lab_batch, **write_options)
+        print(f"  ✓ {written}件更新完了")
     
     # Postsを更新
-    if post_updates:
+    if post_changes:
         print("\nPostsを更新中...")
-        for update in post_updates:
-            supabase.table('posts').update({
-                'published_at': update['published_at']
-            }).eq('slug', update['slug']).execute()
-        print(f"  ✓ {len(post_updates)}件更新完了")
+        def on_posts_batch(value, keys):
+            journal.record_applied('posts', keys)
+            record_write('posts', 'slug', 'published_at', value, keys)
+        
+        written = bulk_update(supabase, 'posts', 'published_at', post_changes, key='slug',
+                              on_batch=on_posts_batch, **write_options)
+        print(f"  ✓ {written}件更新完了")
+    
+    mark(None)
+    journal.finish()
     
     print("\n" + "=" * 70)
     print("✅ 完了")
@@ -0,0 +1,154 @@
+"""
+Shared setup for the migrations tests
+
+The scripts import each other as top-level modules (from common import ...),
+so migrations/ goes on sys.path, as when a script is run. Options are read
+from sys.argv when used, so every test starts from an empty command line.
+"""
+
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def empty_argv(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['pytest'])
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """The slice of the PostgREST query builder the scripts use"""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.filters = []
+        self.values = None
+        self.columns = None
+        self.order_key = None
+        self.max_rows = None
+
+    def select(self, *columns):
+        self.columns = [c.strip() for part in columns for c in part.split(',')]
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def in_(self, key, keys):
+        keys = set(keys)
+        self.filters.append(lambda row: row.get(key) in keys)
+        return self
+
+    def gt(self, key, value):
+        self.filters.append(lambda row: row[key] > value)
+        return self
+
+    def is_(self, key, value):
+        self.filters.append(lambda row: row.get(key) is None)
+        return self
+
+    def order(self, key):
+        self.order_key = key
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def execute(self):
+        self.db.requests += 1
+        rows = [row for row in self.db.tables[self.table] if all(f(row) for f in self.filters)]
+        if self.order_key:
+            rows.sort(key=lambda row: row[self.order_key])
+        if self.max_rows is not None:
+            rows = rows[:self.max_rows]
+        if self.values is not None:
+            self.db.updates.append((self.table, dict(self.values), len(rows)))
+            rows = [row for row in rows if row.get('slug') not in self.db.locked]
+            for row in rows:
+                row.update(self.values)
+        if self.columns:
+            rows = [{c: row.get(c) for c in self.columns} for row in rows]
+        return FakeResponse([dict(row) for row in rows])
+
+
+class FakeRpc:
+    def __init__(self, db, params):
+        self.db = db
+        self.params = params
+
+    def execute(self):
+        if self.db.rpc_error:
+            raise self.db.rpc_error
+        p = self.params
+        self.db.rpc_calls.append(p)
+        returned = []
+        for pair in p['p_rows']:
+            for row in self.db.tables[p['p_table']]:
+                if row.get(p['p_key_column']) == pair['key'] and row.get('slug') not in self.db.locked:
+                    row[p['p_column']] = pair['value']
+                    returned.append({'key': pair['key'], 'value': pair['value']})
+        return FakeResponse(returned)
+
+
+class FakeSupabase:
+    """In-memory stand-in for the supabase client
+
+    Rows whose slug is in `locked` are matched but never changed, like rows
+    a policy or trigger blocks; updates don't return them. Set rpc_error to
+    make bulk_set_column calls raise it (fail_rpc).
+    """
+
+    def __init__(self, tables, locked=()):
+        self.tables = tables
+        self.locked = set(locked)
+        self.requests = 0
+        self.updates = []
+        self.rpc_calls = []
+        self.rpc_error = None
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeRpc(self, params)
+
+    def fail_rpc(self, message, code):
+        """Make every later RPC call raise a PostgREST-style error"""
+        self.rpc_error = RpcError(message, code)
+
+
+class RpcError(Exception):
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+@pytest.fixture
+def fake_supabase():
+    return FakeSupabase
+
+
+@pytest.fixture(autouse=True)
+def reset_bulk_set(monkeypatch):
+    """Every test finds out afresh whether bulk_set_column is installed"""
+    import bulk_write
+    monkeypatch.setattr(bulk_write, '_bulk_set_available', None)
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(monkeypatch, tmp_path):
+    """High-water marks and journals go to a per-test directory"""
+    import journal
+    monkeypatch.setattr(journal, 'JOURNAL_DIR', tmp_path / '.journal')
+    return tmp_path / '.journal'
@@ -0,0 +1,74 @@
+import pytest
+
+import bulk_write
+from bulk_write import bulk_update, group_changes, same_value
+
+
+def lab_rows(n):
+    return {'lab_articles': [{'id': i, 'slug': f's{i}', 'content_type': 'knowledge', 'published_at': None}
+                             for i in range(n)]}
+
+
+def test_group_changes_drops_unchanged_rows():
+    changes = [(1, 'news', 'knowledge'), (2, 'news', 'news'), (3, 'news', None), (4, 'interview', 'news')]
+    assert group_changes(changes) == {'news': [1, 3], 'interview': [4]}
+
+
+@pytest.mark.parametrize('returned, value, expected', [
+    ('news', 'news', True),
+    ('2024-01-01T00:00:00+00:00', '2024-01-01T09:00:00+09:00', True),
+    ('2024-01-01T00:00:00Z', '2024-01-01T00:00:00+00:00', True),
+    ('2024-01-01T00:00:00+00:00', '2024-01-01T00:00:00+09:00', False),
+    ('news', 'interview', False),
+    (None, 'news', False),
+])
+def test_same_value_compares_timestamps_as_instants(returned, value, expected):
+    assert same_value(returned, value) is expected
+
+
+def test_grouped_updates_are_confirmed_by_their_returned_rows(fake_supabase):
+    db = fake_supabase(lab_rows(5), locked={'s3'})
+    confirmed, missed = [], []
+    written = bulk_update(
+        db, 'lab_articles', 'content_type', [(i, 'news', 'knowledge') for i in range(5)],
+        chunk_size=2, parallelism=1,
+        on_batch=lambda value, keys: confirmed.extend(keys),
+        on_missed=lambda value, keys: missed.extend(keys),
+    )
+    assert written == 4
+    assert sorted(confirmed) == [0, 1, 2, 4]
+    assert missed == [3]
+    assert [u[2] for u in db.updates] == [2, 2, 1]
+    assert [row['content_type'] for row in db.tables['lab_articles']] == ['news'] * 3 + ['knowledge', 'news']
+
+
+def test_unique_values_go_through_bulk_set_column(fake_supabase):
+    db = fake_supabase(lab_rows(3), locked={'s1'})
+    missed = []
+    changes = [(i, f'2024-01-0{i + 1}T00:00:00+09:00', None) for i in range(3)]
+    written = bulk_update(db, 'lab_articles', 'published_at', changes, parallelism=1,
+                          on_missed=lambda value, keys: missed.extend(keys))
+    assert written == 2
+    assert missed == [1]
+    assert len(db.rpc_calls) == 1 and not db.updates
+    assert bulk_write._bulk_set_available is True
+
+
+def test_missing_bulk_set_column_falls_back_to_one_update_per_row(fake_supabase, capsys):
+    db = fake_supabase(lab_rows(3))
+    db.fail_rpc('Could not find the function public.bulk_set_column', 'PGRST202')
+    changes = [(i, f'2024-01-0{i + 1}', None) for i in range(3)]
+    assert bulk_update(db, 'lab_articles', 'published_at', changes, parallelism=1) == 3
+    assert len(db.updates) == 3
+    assert bulk_write._bulk_set_available is False
+    assert 'not installed' in capsys.readouterr().out
+
+
+def test_other_rpc_errors_are_raised(fake_supabase):
+    db = fake_supabase(lab_rows(2))
+    db.fail_rpc('canceling statement due to statement timeout', '57014')
+    with pytest.raises(Exception, match='statement timeout'):
+        bulk_update(db, 'lab_articles', 'published_at', [(0, '2024-01-01', None), (1, '2024-01-02', None)],
+                    parallelism=1)
+    assert bulk_write._bulk_set_available is None
+    assert not db.updates
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from classifier import RULES_PATH, ClassifierEngine, article_text
+
+# Keywords that overlap across rules: a shorter keyword of a higher-priority
+# rule starts at the same position as a longer one of a lower-priority rule
+OVERLAPPING_RULES = [
+    {'name': 'interview', 'content_type': 'interview', 'priority': 20, 'keywords': ['データ', 'に聞く']},
+    {'name': 'research', 'content_type': 'research', 'priority': 10, 'keywords': ['データ分析', '聞く', '分析']},
+    {'name': 'news', 'content_type': 'news', 'priority': 5, 'keywords': ['析の基本', 'a']},
+]
+OVERLAPPING_TITLES = ['データ分析の基本', '分析の基本', '専門家に聞く', '聞く力', 'データ', '析の基本', 'A', 'その他']
+FILE_TITLES = ['データ分析インタビュー', '業界動向レポート', '座談会']
+
+
+def reference_content_type(rules, default, article):
+    """content_type by a plain substring scan of each rule in priority order"""
+    text = article_text(article)
+    for rule in sorted(rules, key=lambda r: -r.get('priority', 0)):
+        if any(k.lower() in text for k in rule['keywords']):
+            return rule['content_type']
+    return default
+
+
+@pytest.fixture(params=['regex', 'ahocorasick'])
+def backend(request):
+    if request.param == 'ahocorasick':
+        pytest.importorskip('ahocorasick')
+    return request.param
+
+
+@pytest.mark.parametrize('title', OVERLAPPING_TITLES)
+def test_overlapping_keywords_follow_rule_priority(backend, title):
+    engine = ClassifierEngine(OVERLAPPING_RULES, backend=backend)
+    article = {'title': title}
+    assert engine.classify(article)['content_type'] == reference_content_type(OVERLAPPING_RULES, 'knowledge', article)
+
+
+def test_shorter_keyword_of_higher_priority_rule_wins(backend):
+    result = ClassifierEngine(OVERLAPPING_RULES, backend=backend).classify({'title': 'データ分析の基本'})
+    assert result == {'content_type': 'interview', 'rule': 'interview', 'keyword': 'データ'}
+
+
+@pytest.mark.parametrize('title', FILE_TITLES)
+def test_shipped_rules_match_reference(backend, title):
+    config = json.loads(RULES_PATH.read_text(encoding='utf-8'))
+    engine = ClassifierEngine(config['rules'], config.get('default', 'knowledge'), backend=backend)
+    article = {'title': title}
+    assert engine.classify(article)['content_type'] == \
+        reference_content_type(config['rules'], config.get('default', 'knowledge'), article)
+
+
+def test_no_match_gets_default(backend):
+    result = ClassifierEngine(OVERLAPPING_RULES, default='knowledge', backend=backend).classify({'title': 'その他'})
+    assert result == {'content_type': 'knowledge', 'rule': None, 'keyword': None}
+
+
+def test_categories_and_tags_are_matched_case_insensitively(backend):
+    engine = ClassifierEngine(OVERLAPPING_RULES, backend=backend)
+    assert engine.classify({'title': 'x', 'tags': ['A']})['content_type'] == 'news'
+    assert engine.classify({'title': 'x', 'categories': ['データ']})['content_type'] == 'interview'
@@ -0,0 +1,33 @@
+import pytest
+
+from db_reader import iter_rows, iter_rows_by_keys
+
+
+def posts(n):
+    # Text ids: keyset order is lexicographic
+    return {'posts': [{'id': f'{i:03d}', 'slug': f's{i}', 'published_at': None if i % 2 else '2024-01-01'}
+                      for i in reversed(range(n))]}
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+@pytest.mark.parametrize('n, page_size, pages', [(0, 3, 1), (5, 3, 2), (6, 3, 3), (7, 10, 1)])
+def test_iter_rows_pages_through_every_row_in_key_order(fake_supabase, prefetch, n, page_size, pages):
+    db = fake_supabase(posts(n))
+    rows = list(iter_rows(db, 'posts', 'slug', page_size=page_size, prefetch=prefetch))
+    assert [row['id'] for row in rows] == [f'{i:03d}' for i in range(n)]
+    assert all(set(row) == {'slug', 'id'} for row in rows)
+    assert db.requests == pages
+
+
+def test_iter_rows_pushes_filters_down(fake_supabase):
+    db = fake_supabase(posts(7))
+    rows = list(iter_rows(db, 'posts', 'id, slug', where=lambda q: q.is_('published_at', 'null'), page_size=2))
+    assert [row['slug'] for row in rows] == ['s1', 's3', 's5']
+
+
+def test_iter_rows_by_keys_looks_up_in_chunks(fake_supabase):
+    db = fake_supabase(posts(10))
+    rows = list(iter_rows_by_keys(db, 'posts', 'published_at', 'slug', ['s1', 's4', 's9', 'missing'],
+                                  chunk_size=2))
+    assert sorted(row['slug'] for row in rows) == ['s1', 's4', 's9']
+    assert db.requests == 2
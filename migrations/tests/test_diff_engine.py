@@ -0,0 +1,77 @@
+import pytest
+
+from diff_engine import diff, make_records
+
+FIELDS = ['content_type', 'published_at']
+
+
+def records(rows, presorted=False):
+    return make_records(rows, 'slug', FIELDS, id_field='id', presorted=presorted)
+
+
+def test_adds_updates_and_deletes():
+    source = records([
+        {'slug': 'c', 'content_type': 'news', 'published_at': '2024-01-01'},
+        {'slug': 'a', 'content_type': 'interview', 'published_at': '2024-01-02'},
+        {'slug': 'd', 'content_type': 'news', 'published_at': None},
+    ])
+    target = records([
+        {'slug': 'a', 'id': 1, 'content_type': 'interview', 'published_at': '2024-01-02'},
+        {'slug': 'b', 'id': 2, 'content_type': 'news', 'published_at': None},
+        {'slug': 'c', 'id': 3, 'content_type': 'knowledge', 'published_at': '2024-01-01'},
+    ])
+    plan = diff(source, target, 'lab_articles', 'slug', FIELDS)
+
+    assert plan.summary() == {'add': 1, 'update': 1, 'delete': 1}
+    assert plan.to_dict() == {
+        'table': 'lab_articles',
+        'key': 'slug',
+        'fields': FIELDS,
+        'add': [{'key': 'd', 'new': {'content_type': 'news', 'published_at': None}}],
+        'update': [{'key': 'c', 'id': 3, 'old': {'content_type': 'knowledge'}, 'new': {'content_type': 'news'}}],
+        'delete': [{'key': 'b', 'id': 2}],
+    }
+
+
+def test_changes_per_field_by_id_or_key():
+    source = records([{'slug': 'a', 'content_type': 'news', 'published_at': '2024-02-01'},
+                      {'slug': 'b', 'content_type': 'news', 'published_at': '2024-01-01'}])
+    target = records([{'slug': 'a', 'id': 1, 'content_type': 'news', 'published_at': None},
+                      {'slug': 'b', 'id': 2, 'content_type': 'interview', 'published_at': None}])
+    plan = diff(source, target, 'lab_articles', 'slug', FIELDS)
+
+    assert plan.changes('content_type') == [(2, 'news', 'interview')]
+    assert plan.changes('published_at', by='key') == [('a', '2024-02-01', None), ('b', '2024-01-01', None)]
+
+
+def test_adds_and_deletes_can_be_switched_off():
+    source = records([{'slug': 'a', 'content_type': 'news'}])
+    target = records([{'slug': 'b', 'id': 2, 'content_type': 'news'}])
+    plan = diff(source, target, 'lab_articles', 'slug', FIELDS, adds=False, deletes=False)
+    assert plan.summary() == {'add': 0, 'update': 0, 'delete': 0}
+
+
+def test_ignore_none_keeps_target_values():
+    source = records([{'slug': 'a', 'content_type': None, 'published_at': '2024-01-01'},
+                      {'slug': 'b', 'content_type': None, 'published_at': None}])
+    target = records([{'slug': 'a', 'id': 1, 'content_type': 'news', 'published_at': None},
+                      {'slug': 'b', 'id': 2, 'content_type': 'news', 'published_at': '2023-01-01'}])
+    plan = diff(source, target, 'lab_articles', 'slug', FIELDS, ignore_none=True)
+
+    assert plan.changes('content_type') == []
+    assert plan.changes('published_at') == [(1, '2024-01-01', None)]
+    assert plan.summary()['update'] == 1
+
+
+def test_duplicate_keys_keep_the_last_row():
+    source = records([{'slug': 'a', 'content_type': 'news'}, {'slug': 'a', 'content_type': 'interview'}],
+                     presorted=True)
+    target = records([{'slug': 'a', 'id': 1, 'content_type': 'news'}])
+    plan = diff(source, target, 'lab_articles', 'slug', FIELDS)
+    assert plan.changes('content_type') == [(1, 'interview', 'news')]
+
+
+def test_presorted_input_out_of_order_raises():
+    source = records([{'slug': 'b'}, {'slug': 'a'}], presorted=True)
+    with pytest.raises(ValueError, match='not ordered by key'):
+        diff(source, records([]), 'lab_articles', 'slug', FIELDS)
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from bench_stubs import _Server  # noqa: E402
+from http_cache import HttpCache  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+
+PAGE = b'<html>' + b'x' * 100_000 + b'</html>'
+
+
+class ConditionalServer(_Server):
+    """/page carries an ETag and answers a matching If-None-Match with 304"""
+
+    def __init__(self):
+        self.etag = '"v1"'
+        self.requests = []
+        super().__init__()
+
+    def handle(self, method, path, headers, body):
+        self.requests.append((path, headers.get('If-None-Match')))
+        if path == '/plain':
+            return 200, {}, b'no validators'
+        if path != '/page':
+            return 404, {}, b''
+        if headers.get('If-None-Match') == self.etag:
+            return 304, {'ETag': self.etag}, b''
+        return 200, {'ETag': self.etag, 'Content-Type': 'text/html'}, PAGE
+
+
+@pytest.fixture
+def server():
+    stub = ConditionalServer()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(tmp_path / 'cache.sqlite3')
+    yield cache
+    cache.close()
+
+
+def response(url, body, headers):
+    r = requests.Response()
+    r.url = url
+    r.status_code = 200
+    r.headers.update(headers)
+    r._content = body
+    return r
+
+
+def test_store_needs_a_validator(cache):
+    assert not cache.store('http://wp/a', response('http://wp/a', b'a', {}))
+    assert cache.lookup('http://wp/a') is None
+
+    assert cache.store('http://wp/b', response('http://wp/b', b'b', {'ETag': '"1"', 'Last-Modified': 'x'}))
+    entry = cache.lookup('http://wp/b')
+    assert entry['body'] == b'b' and entry['complete']
+    assert HttpCache.conditional_headers(entry) == {'If-None-Match': '"1"', 'If-Modified-Since': 'x'}
+
+
+def test_prefix_entries_only_serve_partial_lookups(cache):
+    cache.store('http://wp/a', response('http://wp/a', b'abc', {'ETag': '"1"'}), body=b'a', complete=False)
+    assert cache.lookup('http://wp/a') is None
+    assert cache.lookup('http://wp/a', partial=True)['body'] == b'a'
+
+
+def test_evict_drops_old_then_least_recently_used_entries(tmp_path):
+    cache = HttpCache(tmp_path / 'cache.sqlite3', max_bytes=10)
+    for name in 'abc':
+        cache.store(f'http://wp/{name}', response(f'http://wp/{name}', b'12345', {'ETag': '"1"'}))
+        time.sleep(0.01)
+    cache.evict()
+    assert [cache.lookup(f'http://wp/{name}') is not None for name in 'abc'] == [False, True, True]
+
+    cache.max_age = 0
+    cache.evict()
+    assert cache.lookup('http://wp/c') is None
+    cache.close()
+
+
+def test_unchanged_page_is_served_from_the_cache(server, cache):
+    client = HttpClient(rate=1000, cache=cache)
+    first = client.get(f'{server.url}/page')
+    second = client.get(f'{server.url}/page')
+
+    assert first.content == second.content == PAGE
+    assert getattr(second, 'from_cache', False)
+    assert server.requests == [('/page', None), ('/page', '"v1"')]
+
+
+def test_changed_page_is_downloaded_again(server, cache):
+    client = HttpClient(rate=1000, cache=cache)
+    client.get(f'{server.url}/page')
+    server.etag = '"v2"'
+    again = client.get(f'{server.url}/page')
+
+    assert not getattr(again, 'from_cache', False)
+    assert cache.lookup(f'{server.url}/page')['etag'] == '"v2"'
+
+
+def test_responses_without_validators_are_not_cached(server, cache):
+    client = HttpClient(rate=1000, cache=cache)
+    client.get(f'{server.url}/plain')
+    client.get(f'{server.url}/plain')
+    assert server.requests == [('/plain', None), ('/plain', None)]
+
+
+def test_streamed_prefix_is_replayed_and_continued(server, cache):
+    client = HttpClient(rate=1000, cache=cache)
+    url = f'{server.url}/page'
+    with client.get(url, stream=True) as r:
+        head = next(r.iter_content(1024))
+    assert cache.lookup(url) is None
+    assert cache.lookup(url, partial=True)['body'] == head
+
+    # A non-streamed request can't use the prefix
+    assert not getattr(client.get(url), 'from_cache', False)
+    server.requests.clear()
+
+    cache.store(url, response(url, PAGE, {'ETag': '"v1"'}), body=head, complete=False)
+    with client.get(url, stream=True) as r:
+        assert r.from_cache
+        assert b''.join(r.iter_content(4096)) == PAGE
+    # 304 for the prefix, then one plain GET for the rest of the body
+    assert server.requests == [('/page', '"v1"'), ('/page', None)]
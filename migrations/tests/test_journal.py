@@ -0,0 +1,76 @@
+import sys
+
+from journal import Journal, open_journal, read_high_water, write_high_water
+
+
+def test_resume_replays_fetched_and_applied(tmp_path):
+    path = tmp_path / 'sync.jsonl'
+    journal = Journal(path)
+    journal.record_fetched('lab_articles', 'a', '2024-01-01T00:00:00+09:00')
+    journal.record_fetched('lab_articles', 'b', None)
+    journal.record_applied('lab_articles', ['a'])
+    journal.close()
+
+    resumed = Journal(path, resume=True)
+    assert resumed.fetched['lab_articles'] == {'a': '2024-01-01T00:00:00+09:00', 'b': None}
+    assert resumed.applied['lab_articles'] == {'a'}
+    assert resumed.is_done('lab_articles', 'b')
+    assert not resumed.is_done('lab_articles', 'c')
+    assert not resumed.is_done('posts', 'a')
+    resumed.close()
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    path = tmp_path / 'sync.jsonl'
+    journal = Journal(path)
+    journal.record_fetched('lab_articles', 'a', 'x')
+    journal.close()
+
+    fresh = Journal(path)
+    assert not fresh.is_done('lab_articles', 'a')
+    fresh.close()
+    assert path.read_text(encoding='utf-8') == ''
+
+
+def test_a_line_cut_short_by_a_crash_is_skipped(tmp_path):
+    path = tmp_path / 'sync.jsonl'
+    journal = Journal(path)
+    journal.record_fetched('lab_articles', 'a', 'x')
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "fetched", "scope": "lab_articles", "key": "b", "va')
+
+    resumed = Journal(path, resume=True)
+    resumed.record_fetched('lab_articles', 'c', 'z')
+    resumed.close()
+
+    again = Journal(path, resume=True)
+    assert again.fetched['lab_articles'] == {'a': 'x', 'c': 'z'}
+    again.close()
+
+
+def test_finish_removes_the_journal(tmp_path):
+    path = tmp_path / 'sync.jsonl'
+    journal = Journal(path)
+    journal.record_applied('posts', ['a', 'b'])
+    journal.finish()
+    assert not path.exists()
+
+
+def test_open_journal_resumes_with_the_option(journal_dir, monkeypatch):
+    journal = open_journal('sync_from_wp')
+    journal.record_fetched('posts', 'a', 'x')
+    journal.close()
+    assert (journal_dir / 'sync_from_wp.jsonl').exists()
+
+    monkeypatch.setattr(sys, 'argv', ['pytest', '--resume'])
+    resumed = open_journal('sync_from_wp')
+    assert resumed.is_done('posts', 'a')
+    resumed.close()
+
+
+def test_high_water_round_trip(journal_dir):
+    assert read_high_water('sync_from_wp') is None
+    write_high_water('sync_from_wp', '2024-06-01T00:00:00+09:00')
+    assert read_high_water('sync_from_wp') == '2024-06-01T00:00:00+09:00'
+    assert (journal_dir / 'sync_from_wp.high_water').exists()
@@ -0,0 +1,80 @@
+import json
+import sys
+
+from journal import read_high_water
+from plans import apply_plan, run_apply
+
+OPTIONS = {'chunk_size': 100, 'parallelism': 1}
+
+
+def lab_table():
+    return {'lab_articles': [
+        {'id': 1, 'slug': 'done', 'content_type': 'news', 'published_at': '2024-01-01T00:00:00+00:00'},
+        {'id': 2, 'slug': 'write', 'content_type': 'knowledge', 'published_at': None},
+        {'id': 3, 'slug': 'stale', 'content_type': 'research', 'published_at': None},
+        {'id': 4, 'slug': 'locked', 'content_type': 'knowledge', 'published_at': None},
+    ]}
+
+
+def lab_plan(*slugs):
+    ids = {'done': 1, 'write': 2, 'stale': 3, 'locked': 4, 'gone': 5}
+    entries = {
+        # Applied by an earlier run; the database returns the UTC form
+        'done': {'old': {'published_at': None}, 'new': {'published_at': '2024-01-01T09:00:00+09:00'}},
+        'write': {'old': {'content_type': 'knowledge'}, 'new': {'content_type': 'news'}},
+        # Changed by someone else since the plan was made
+        'stale': {'old': {'content_type': 'knowledge'}, 'new': {'content_type': 'news'}},
+        'locked': {'old': {'content_type': 'knowledge'}, 'new': {'content_type': 'news'}},
+        'gone': {'old': {'content_type': 'knowledge'}, 'new': {'content_type': 'news'}},
+    }
+    return {
+        'table': 'lab_articles', 'key': 'slug', 'fields': ['content_type', 'published_at'],
+        'add': [], 'delete': [],
+        'update': [{'key': slug, 'id': ids[slug], **entries[slug]} for slug in slugs],
+    }
+
+
+def test_apply_plan_counts_done_stale_written_and_missed(fake_supabase):
+    db = fake_supabase(lab_table(), locked={'locked'})
+    stats = apply_plan(db, lab_plan('done', 'write', 'stale', 'locked', 'gone'), OPTIONS)
+    assert stats == {'written': 1, 'done': 1, 'stale': 2, 'missed': 1}
+    rows = {row['slug']: row for row in db.tables['lab_articles']}
+    assert rows['write']['content_type'] == 'news'
+    assert rows['stale']['content_type'] == 'research'
+
+
+def test_apply_plan_without_updates_reads_nothing(fake_supabase):
+    db = fake_supabase(lab_table())
+    assert apply_plan(db, lab_plan(), OPTIONS) == {'written': 0, 'done': 0, 'stale': 0, 'missed': 0}
+    assert not db.updates
+
+
+def write_plan(tmp_path, monkeypatch, plan):
+    path = tmp_path / 'plan.json'
+    path.write_text(json.dumps({
+        'script': 'sync_content_types_from_wp', 'created_at': '2024-06-01T00:00:00+00:00',
+        'high_water': '2024-06-01T00:00:00+09:00', 'plans': [plan],
+    }), encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['pytest', '--apply', str(path), '--parallelism', '1'])
+
+
+def test_run_apply_saves_the_mark_when_everything_applied(fake_supabase, tmp_path, monkeypatch):
+    write_plan(tmp_path, monkeypatch, lab_plan('done', 'write'))
+    assert run_apply(fake_supabase(lab_table()), 'sync_content_types_from_wp')
+    assert read_high_water('sync_content_types_from_wp') == '2024-06-01T00:00:00+09:00'
+
+
+def test_run_apply_holds_the_mark_on_missed_entries(fake_supabase, tmp_path, monkeypatch):
+    write_plan(tmp_path, monkeypatch, lab_plan('write', 'locked'))
+    run_apply(fake_supabase(lab_table(), locked={'locked'}), 'sync_content_types_from_wp')
+    assert read_high_water('sync_content_types_from_wp') is None
+
+
+def test_run_apply_holds_the_mark_on_stale_entries(fake_supabase, tmp_path, monkeypatch):
+    write_plan(tmp_path, monkeypatch, lab_plan('write', 'stale'))
+    run_apply(fake_supabase(lab_table()), 'sync_content_types_from_wp')
+    assert read_high_water('sync_content_types_from_wp') is None
+
+
+def test_run_apply_without_option_does_nothing(fake_supabase):
+    assert run_apply(fake_supabase(lab_table()), 'sync_content_types_from_wp') is False
@@ -0,0 +1,55 @@
+import sys
+
+from journal import read_high_water, write_high_water
+from sync_daemon import advance_high_water, newer, start_mark, sync_rows
+
+
+def test_newer_compares_naive_and_aware_timestamps():
+    # A date-only --since is naive (JST); WordPress modified times carry an offset
+    assert newer('2019-12-31', '2019-12-30T16:00:00+00:00') == '2019-12-30T16:00:00+00:00'
+    assert newer('2019-12-31', '2019-12-31T00:00:01+09:00') == '2019-12-31T00:00:01+09:00'
+    assert newer('2019-12-31', '2019-12-30T14:00:00+00:00') == '2019-12-31T00:00:00+09:00'
+    assert newer(None, '2020-01-01') == '2020-01-01T00:00:00+09:00'
+    assert newer(None, None) is None
+
+
+def test_start_mark_normalizes_since(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['pytest', '--since', '2019-12-31'])
+    assert start_mark('sync_daemon_lab') == '2019-12-31T00:00:00+09:00'
+    write_high_water('sync_daemon_lab', '2024-06-01T00:00:00+09:00')
+    assert start_mark('sync_daemon_lab') == '2024-06-01T00:00:00+09:00'
+
+
+def test_start_mark_without_since():
+    assert start_mark('sync_daemon_lab') is None
+
+
+def test_advance_high_water_holds_on_missed_writes():
+    advance_high_water('sync_daemon_lab', '2024-06-01T00:00:00+09:00', {'missed': 1}, dry_run=False)
+    assert read_high_water('sync_daemon_lab') is None
+    advance_high_water('sync_daemon_lab', '2024-06-01T00:00:00+09:00', {'missed': 0}, dry_run=True)
+    assert read_high_water('sync_daemon_lab') is None
+    advance_high_water('sync_daemon_lab', '2024-06-01T00:00:00+09:00', {'missed': 0}, dry_run=False)
+    assert read_high_water('sync_daemon_lab') == '2024-06-01T00:00:00+09:00'
+
+
+def test_sync_rows_fills_in_published_at_and_counts_misses(fake_supabase, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['pytest', '--parallelism', '1'])
+    db = fake_supabase({'lab_articles': [
+        {'slug': 'a', 'content_type': 'knowledge', 'published_at': None},
+        {'slug': 'b', 'content_type': 'news', 'published_at': '2023-01-01T00:00:00+00:00'},
+        {'slug': 'c', 'content_type': 'knowledge', 'published_at': None},
+    ]}, locked={'c'})
+    wp_rows = [
+        {'slug': 'a', 'content_type': 'news', 'published_at': '2024-01-01T00:00:00+09:00'},
+        {'slug': 'b', 'content_type': 'news', 'published_at': '2024-01-02T00:00:00+09:00'},
+        {'slug': 'c', 'content_type': 'news', 'published_at': None},
+        {'slug': 'new', 'content_type': 'news', 'published_at': None},
+    ]
+    counts = sync_rows(db, 'lab_articles', wp_rows, ['content_type', 'published_at'], dry_run=False)
+
+    assert counts == {'missing': 1, 'missed': 1, 'content_type': 1, 'published_at': 1}
+    rows = {row['slug']: row for row in db.tables['lab_articles']}
+    assert rows['a'] == {'slug': 'a', 'content_type': 'news', 'published_at': '2024-01-01T00:00:00+09:00'}
+    # An existing published_at is never overwritten
+    assert rows['b']['published_at'] == '2023-01-01T00:00:00+00:00'